@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -9,13 +9,17 @@ Base = declarative_base()
 
 class Book(Base):
     __tablename__ = "books"
+    # Fetch server-generated created_at via RETURNING on insert instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     source_lang = Column(String(10), nullable=False)
     target_lang = Column(String(10), nullable=False, default="zh-CN")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     glossary_id = Column(Integer, ForeignKey("glossaries.id"), nullable=True)
+    source_ext = Column(String(8), nullable=True)  # Extension of the uploaded source file, e.g. ".pdf"
     
     # Relationships
     pages = relationship("Page", back_populates="book", cascade="all, delete-orphan")
@@ -38,6 +42,11 @@ class Page(Base):
     # Relationships
     book = relationship("Book", back_populates="pages")
     blocks = relationship("Block", back_populates="page", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Serves "pages of a book in page order" without a sort step
+        Index("ix_pages_book_index", "book_id", "index"),
+    )
 
 
 class Block(Base):
@@ -56,13 +65,27 @@ class Block(Base):
     spans = Column(JSON, default=list)  # Formatting spans
     refs = Column(JSON, default=list)   # References to other blocks
     status = Column(String(20), default="pending")  # pending, translating, translated, typeset
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     page = relationship("Page", back_populates="blocks")
+    
+    __table_args__ = (
+        # Serves "blocks of a page in reading order" without a sort step
+        Index("ix_blocks_page_order", "page_id", "order"),
+        # Only the blocks still waiting for translation, as scanned by the translation job
+        Index(
+            "ix_blocks_untranslated", "page_id",
+            postgresql_where=text_translated.is_(None),
+            sqlite_where=text_translated.is_(None)
+        ),
+    )
 
 
 class Glossary(Base):
     __tablename__ = "glossaries"
+    # Fetch server-generated created_at via RETURNING on insert instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -90,6 +113,8 @@ class GlossaryTerm(Base):
 
 class Job(Base):
     __tablename__ = "jobs"
+    # Fetch server-generated created_at via RETURNING on insert instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
@@ -106,6 +131,8 @@ class Job(Base):
 
 class Export(Base):
     __tablename__ = "exports"
+    # Fetch server-generated created_at via RETURNING on insert instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
@@ -1,10 +1,15 @@
 from abc import ABC, abstractmethod
-from typing import List, Union
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, Union
 from pathlib import Path
 import io
+import asyncio
+import hashlib
 # from PIL import Image  # Optional dependency
 
 from app.shared.schemas import OCRResult
+from app.backend.services.cache import CONTENT_CACHE_TTL, get_or_set
+from app.shared.constants import OCR_CONCURRENCY
 
 
 class OCRProvider(ABC):
@@ -23,19 +28,64 @@ class OCRProvider(ABC):
         """
         pass
     
+    async def process_image_cached(self, image: Union[str, Path, io.BytesIO]) -> OCRResult:
+        """
+        Process an image, reusing the cached result for identical image bytes.
+        """
+        if isinstance(image, io.BytesIO):
+            data = image.getvalue()
+        else:
+            data = await asyncio.to_thread(Path(image).read_bytes)
+        
+        key = f"ocr:{type(self).__name__}:{hashlib.sha256(data).hexdigest()}"
+        
+        async def load() -> str:
+            return (await self.process_image(image)).model_dump_json()
+        
+        return OCRResult.model_validate_json(await get_or_set(key, CONTENT_CACHE_TTL, load))
+    
     @abstractmethod
-    async def process_pdf(self, pdf_path: Union[str, Path]) -> List[OCRResult]:
+    def process_pdf(self, pdf_path: Union[str, Path]) -> AsyncIterator[OCRResult]:
         """
-        Process a PDF file and return OCR results for each page.
+        Process a PDF file and yield OCR results page by page.
+        
+        Implementations are async generators, so only a bounded number of
+        pages' results need to be held in memory at a time.
         
         Args:
             pdf_path: Path to PDF file
             
-        Returns:
-            List of OCRResult objects, one per page
+        Yields:
+            OCRResult for each page, in page order
         """
         pass
     
+    async def iter_pages(
+        self,
+        page_count: int,
+        process_page: Callable[[int], Awaitable[OCRResult]],
+        concurrency: int = OCR_CONCURRENCY
+    ) -> AsyncIterator[OCRResult]:
+        """
+        Run process_page for each page index and yield results in page order.
+        
+        Up to `concurrency` pages are processed ahead of the one being
+        consumed, so OCR latency overlaps across pages and with the caller's
+        handling of earlier pages, while memory stays bounded.
+        """
+        pending = deque()
+        next_index = 0
+        try:
+            while next_index < page_count or pending:
+                while next_index < page_count and len(pending) < concurrency:
+                    pending.append(asyncio.ensure_future(process_page(next_index)))
+                    next_index += 1
+                yield await pending.popleft()
+        finally:
+            # The consumer stopped early or failed; don't leave pages running
+            for task in pending:
+                task.cancel()
+    
     def normalize_reading_order(self, blocks: List, page_width: int, page_height: int) -> List[str]:
         """
         Determine reading order for blocks when not provided by OCR.
@@ -44,37 +94,36 @@ class OCRProvider(ABC):
         if not blocks:
             return []
         
-        # Sort blocks by position
-        sorted_blocks = sorted(blocks, key=lambda b: (b.bbox.y, b.bbox.x))
+        # Extract coordinates once and sort plain (y, x) tuples; comparing
+        # tuples runs in C instead of calling a key lambda per block
+        points = sorted((b.bbox.y, b.bbox.x, i, b.id) for i, b in enumerate(blocks))
         
-        # Detect columns by grouping blocks with similar x coordinates
+        # Detect columns by grouping blocks with similar x coordinates,
+        # keeping a running x sum so the column average is O(1) per block
         columns = []
+        column_avgs = []
         current_column = []
+        sum_x = 0.0
+        tolerance = page_width * 0.1  # 10% tolerance
         
-        for block in sorted_blocks:
-            if not current_column:
-                current_column.append(block)
-            else:
-                # Check if this block is in the same column (similar x position)
-                avg_x = sum(b.bbox.x for b in current_column) / len(current_column)
-                if abs(block.bbox.x - avg_x) < page_width * 0.1:  # 10% tolerance
-                    current_column.append(block)
-                else:
-                    # Start new column
-                    columns.append(current_column)
-                    current_column = [block]
+        for point in points:
+            x = point[1]
+            if current_column and abs(x - sum_x / len(current_column)) >= tolerance:
+                # Start new column
+                columns.append(current_column)
+                column_avgs.append(sum_x / len(current_column))
+                current_column = []
+                sum_x = 0.0
+            current_column.append(point)
+            sum_x += x
         
         if current_column:
             columns.append(current_column)
+            column_avgs.append(sum_x / len(current_column))
         
         # Sort columns by average x position
-        columns.sort(key=lambda col: sum(b.bbox.x for b in col) / len(col))
-        
-        # Extract reading order
-        reading_order = []
-        for column in columns:
-            # Sort blocks in column by y position
-            column.sort(key=lambda b: b.bbox.y)
-            reading_order.extend(b.id for b in column)
+        columns = [columns[i] for i in sorted(range(len(columns)), key=column_avgs.__getitem__)]
         
-        return reading_order
\ No newline at end of file
+        # Extract reading order; points were visited top to bottom, so each
+        # column is already in y order
+        return [p[3] for column in columns for p in column]
\ No newline at end of file
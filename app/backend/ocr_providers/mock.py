@@ -1,22 +1,34 @@
-import json
+import os
 import asyncio
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Union
+import orjson
+from typing import AsyncIterator, Union
 import io
 
 from .base import OCRProvider
 from app.shared.schemas import OCRResult, OCRPage, OCRBlock, OCRLine, BBox, BlockType
 
 
+@lru_cache(maxsize=128)
+def _read_sample(path: str) -> dict:
+    """Parse a sample JSON file once per process; callers build a fresh model from it."""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
 class MockOCRProvider(OCRProvider):
     """Mock OCR provider that loads pre-generated sample data."""
     
     def __init__(self, samples_dir: Path = None):
         self.samples_dir = samples_dir or Path("app/samples/ocr_outputs")
+        # Simulated per-page processing time in seconds; off unless configured
+        self.sim_delay = float(os.getenv("MOCK_OCR_DELAY", "0"))
         
     async def process_image(self, image: Union[str, Path, io.BytesIO]) -> OCRResult:
         """Load mock OCR result from sample data."""
-        await asyncio.sleep(0.5)  # Simulate processing time
+        if self.sim_delay:
+            await asyncio.sleep(self.sim_delay)  # Simulate processing time
         
         # For demo purposes, always return the same sample
         sample_file = self.samples_dir / "sample_page_1.json"
@@ -25,27 +37,24 @@ class MockOCRProvider(OCRProvider):
         else:
             return self._generate_default_sample()
     
-    async def process_pdf(self, pdf_path: Union[str, Path]) -> List[OCRResult]:
-        """Load mock OCR results for multiple pages."""
-        await asyncio.sleep(1.0)  # Simulate processing time
-        
-        results = []
-        for i in range(3):  # Simulate 3 pages
-            sample_file = self.samples_dir / f"sample_page_{i+1}.json"
-            if sample_file.exists():
-                result = await self._load_sample(sample_file)
-            else:
-                result = self._generate_default_sample(page_index=i)
-            results.append(result)
-        
-        return results
+    async def process_pdf(self, pdf_path: Union[str, Path]) -> AsyncIterator[OCRResult]:
+        """Yield mock OCR results for multiple pages."""
+        async for result in self.iter_pages(3, self._process_pdf_page):  # Simulate 3 pages
+            yield result
+    
+    async def _process_pdf_page(self, page_index: int) -> OCRResult:
+        """Load the mock OCR result for one PDF page."""
+        if self.sim_delay:
+            await asyncio.sleep(self.sim_delay)  # Simulate processing time
+        sample_file = self.samples_dir / f"sample_page_{page_index+1}.json"
+        if sample_file.exists():
+            return await self._load_sample(sample_file)
+        return self._generate_default_sample(page_index=page_index)
     
     async def _load_sample(self, sample_file: Path) -> OCRResult:
         """Load OCR result from JSON file."""
         try:
-            with open(sample_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return OCRResult(**data)
+            return OCRResult(**_read_sample(str(sample_file)))
         except Exception as e:
             print(f"Error loading sample {sample_file}: {e}")
             return self._generate_default_sample()
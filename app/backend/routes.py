@@ -0,0 +1,317 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError
+from typing import List, Optional
+from datetime import datetime, timezone
+import os
+import hashlib
+import aiofiles
+import aiofiles.os
+import orjson
+from pathlib import Path
+import uuid
+
+from app.backend.database import get_db
+from app.backend.models import Book, Page, Block, Glossary, GlossaryTerm, Job, Export
+from app.backend.services.cache import get_redis
+from app.workers.queues import JOB_FAILURE_CALLBACK, get_queue, job_status_key
+from app.shared.schemas import (
+    BookCreate, Book as BookSchema, 
+    Page as PageSchema, BlockUpdate,
+    GlossaryCreate, Glossary as GlossarySchema,
+    GlossaryTermCreate, GlossaryTerm as GlossaryTermSchema,
+    TranslationRequest, TypesetRequest, ExportRequest,
+    Job as JobSchema, Export as ExportSchema
+)
+from app.shared.constants import BOOKS_DIR, UPLOAD_CHUNK_SIZE, JOB_TIMEOUT, READ_CACHE_CONTROL
+
+# FastAPI metadata for the application and its OpenAPI schema
+API_INFO = {
+    "title": "GPTrans API",
+    "description": "OCR to Chinese Translation and Typesetting Service",
+    "version": "1.0.0",
+}
+
+# Importing this module registers the API routes without building the app,
+# so schema generation needs neither the data directories nor startup hooks
+router = APIRouter()
+
+
+@router.get("/api/health")
+async def health_check():
+    """Health check endpoint."""
+    return {"status": "healthy", "message": "GPTrans API is running"}
+
+
+@router.post("/api/upload", response_model=BookSchema)
+async def upload_book(
+    file: UploadFile = File(...),
+    title: str = "Untitled Book",
+    source_lang: str = "de",
+    db: AsyncSession = Depends(get_db)
+):
+    """Upload a book (image or PDF) and create a new book record."""
+    
+    # Validate file type
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file selected")
+    
+    file_ext = Path(file.filename).suffix.lower()
+    if file_ext not in {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.pdf'}:
+        raise HTTPException(status_code=400, detail="Unsupported file format")
+    
+    # Create book record
+    book = Book(
+        title=title,
+        source_lang=source_lang,
+        target_lang="zh-CN",
+        source_ext=file_ext
+    )
+    db.add(book)
+    await db.commit()
+    
+    # Save uploaded file
+    book_dir = BOOKS_DIR / str(book.id)
+    await aiofiles.os.makedirs(book_dir, exist_ok=True)
+    
+    file_path = book_dir / f"source{file_ext}"
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await buffer.write(chunk)
+    await file.close()
+    
+    # Create initial page record for images
+    if file_ext != '.pdf':
+        page = Page(
+            book_id=book.id,
+            index=0,
+            image_url=f"/static/books/{book.id}/source{file_ext}",
+            width=1240,  # Default dimensions
+            height=1754,
+            dpi=150
+        )
+        db.add(page)
+        await db.commit()
+    
+    return BookSchema.from_orm(book)
+
+
+@router.post("/api/books/{book_id}/ocr/normalize")
+async def normalize_ocr(
+    book_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Normalize OCR data for a book."""
+    
+    book = (await db.execute(select(Book).where(Book.id == book_id))).scalar_one_or_none()
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    
+    # Create OCR job
+    job = Job(book_id=book_id, type="ocr", status="pending")
+    db.add(job)
+    await db.commit()
+    
+    # Hand off to the RQ workers so long-running OCR doesn't tie up the API process
+    get_queue('ocr').enqueue(
+        "app.workers.main.sync_process_ocr_job", book_id, job.id, job_timeout=JOB_TIMEOUT,
+        on_failure=JOB_FAILURE_CALLBACK
+    )
+    
+    return {"message": "OCR processing started", "job_id": job.id}
+
+
+@router.post("/api/books/{book_id}/translate")
+async def translate_book(
+    book_id: int,
+    request: TranslationRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Translate all blocks in a book."""
+    
+    book = (await db.execute(select(Book).where(Book.id == book_id))).scalar_one_or_none()
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    
+    # Create translation job
+    job = Job(book_id=book_id, type="translate", status="pending")
+    db.add(job)
+    await db.commit()
+    
+    # Hand off to the RQ workers
+    get_queue('translation').enqueue(
+        "app.workers.main.sync_process_translation_job", book_id, job.id, request.dict(),
+        job_timeout=JOB_TIMEOUT, on_failure=JOB_FAILURE_CALLBACK
+    )
+    
+    return {"message": "Translation started", "job_id": job.id}
+
+
+@router.get("/api/jobs/{job_id}", response_model=JobSchema)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Get a job's status, including the progress of a running job."""
+    job = (await db.execute(select(Job).where(Job.id == job_id))).scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    result = JobSchema.from_orm(job)
+    if job.status in ("completed", "failed"):
+        return result
+    
+    # Workers keep a running job's status in Redis and write the row only
+    # when it ends; without the hash the row's own status stands
+    try:
+        running = await get_redis().hgetall(job_status_key(job_id))
+    except RedisError:
+        running = {}
+    if not running:
+        return result
+    
+    running = {key.decode(): value.decode() for key, value in running.items()}
+    updates = {"status": running.get("status", job.status)}
+    if "logs" in running:
+        updates["logs"] = running["logs"]
+    if "started" in running:
+        updates["started_at"] = datetime.fromtimestamp(float(running["started"]), timezone.utc)
+    return JobSchema(**{**result.dict(), **updates})
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values that identify a resource version."""
+    return '"' + hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest() + '"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already holds this ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # If-None-Match is a list of tags compared weakly, so a W/ prefix still matches
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if "*" in candidates or etag in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": READ_CACHE_CONTROL})
+    return None
+
+
+@router.get("/api/books/{book_id}", response_model=BookSchema)
+async def get_book(book_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get book details."""
+    book = (await db.execute(select(Book).where(Book.id == book_id))).scalar_one_or_none()
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    
+    etag = make_etag(book.id, book.updated_at)
+    if cached := not_modified(request, etag):
+        return cached
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = READ_CACHE_CONTROL
+    return BookSchema.from_orm(book)
+
+
+@router.get("/api/books/{book_id}/blocks")
+async def get_book_blocks(book_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Get all blocks for a book."""
+    # Block edits don't touch the book row, so version the list by its
+    # latest block change; this aggregate is far cheaper than the full read
+    count, last_updated = (await db.execute(
+        select(func.count(Block.id), func.max(Block.updated_at)).join(Page).where(
+            Page.book_id == book_id
+        )
+    )).one()
+    
+    etag = make_etag(book_id, count, last_updated)
+    if cached := not_modified(request, etag):
+        return cached
+    
+    # Select plain columns so no ORM objects or relationships are loaded
+    rows = (await db.execute(
+        select(*Block.__table__.c).join(Page).where(
+            Page.book_id == book_id
+        ).order_by(Page.index, Block.order)
+    )).mappings().all()
+    
+    return Response(
+        content=orjson.dumps([dict(row) for row in rows]),
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": READ_CACHE_CONTROL}
+    )
+
+
+@router.patch("/api/blocks/{block_id}")
+async def update_block(
+    block_id: int,
+    update: BlockUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Update a block's translation."""
+    values = update.dict(exclude_none=True)
+    if values:
+        # Update and read back the flat row in one statement
+        stmt = Block.__table__.update().where(Block.id == block_id).values(**values).returning(*Block.__table__.c)
+    else:
+        stmt = select(*Block.__table__.c).where(Block.id == block_id)
+    
+    row = (await db.execute(stmt)).mappings().one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Block not found")
+    
+    await db.commit()
+    return Response(content=orjson.dumps(dict(row)), media_type="application/json")
+
+
+@router.post("/api/glossaries", response_model=GlossarySchema)
+async def create_glossary(
+    glossary: GlossaryCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Create a new glossary."""
+    # Start with an empty terms collection so serializing it never lazy loads
+    db_glossary = Glossary(**glossary.dict(), terms=[])
+    db.add(db_glossary)
+    await db.commit()
+    return GlossarySchema.from_orm(db_glossary)
+
+
+@router.post("/api/glossaries/{glossary_id}/terms", response_model=GlossaryTermSchema)
+async def create_glossary_term(
+    glossary_id: int,
+    term: GlossaryTermCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Add a term to a glossary."""
+    glossary = (await db.execute(
+        select(Glossary).where(Glossary.id == glossary_id)
+    )).scalar_one_or_none()
+    if not glossary:
+        raise HTTPException(status_code=404, detail="Glossary not found")
+    
+    db_term = GlossaryTerm(glossary_id=glossary_id, **term.dict())
+    db.add(db_term)
+    await db.commit()
+    return GlossaryTermSchema.from_orm(db_term)
+
+
+@router.post("/api/glossaries/{glossary_id}/terms/bulk", response_model=List[GlossaryTermSchema])
+async def create_glossary_terms_bulk(
+    glossary_id: int,
+    terms: List[GlossaryTermCreate],
+    db: AsyncSession = Depends(get_db)
+):
+    """Add multiple terms to a glossary in a single INSERT."""
+    glossary = (await db.execute(
+        select(Glossary).where(Glossary.id == glossary_id)
+    )).scalar_one_or_none()
+    if not glossary:
+        raise HTTPException(status_code=404, detail="Glossary not found")
+    
+    if not terms:
+        return []
+    
+    db_terms = (await db.scalars(
+        insert(GlossaryTerm).returning(GlossaryTerm),
+        [{"glossary_id": glossary_id, **term.dict()} for term in terms]
+    )).all()
+    await db.commit()
+    return [GlossaryTermSchema.from_orm(db_term) for db_term in db_terms]
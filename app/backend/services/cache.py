@@ -0,0 +1,122 @@
+import os
+import asyncio
+import hashlib
+import logging
+import weakref
+from typing import Awaitable, Callable, List, Sequence, Union
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed entries never go stale (same input -> same output),
+# so the TTL only bounds how long unused entries occupy memory
+CONTENT_CACHE_TTL = 30 * 24 * 3600  # 30 days
+
+# asyncio Redis connections are bound to the loop that created them, and the
+# RQ workers run each job in a fresh loop, so keep one client per loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> Redis:
+    """Get the Redis client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', '6379')),
+            db=int(os.getenv('REDIS_DB', '0'))
+        )
+        _clients[loop] = client
+    return client
+
+
+def content_key(prefix: str, *parts: str) -> str:
+    """Build a cache key from the SHA-256 of the given input parts."""
+    digest = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+async def get_or_set(key: str, ttl: int, loader: Callable[[], Awaitable[str]]) -> str:
+    """
+    Return the cached value for key, or compute it with loader and cache it.
+
+    Redis errors are logged and treated as a cache miss so that an
+    unavailable cache never fails the underlying operation.
+    """
+    redis = get_redis()
+
+    try:
+        cached = await redis.get(key)
+    except RedisError as e:
+        logger.warning(f"Cache read failed for {key}: {e}")
+        cached = None
+
+    if cached is not None:
+        return cached.decode("utf-8")
+
+    value = await loader()
+
+    try:
+        await redis.set(key, value, ex=ttl)
+    except RedisError as e:
+        logger.warning(f"Cache write failed for {key}: {e}")
+
+    return value
+
+
+async def get_or_set_many(
+    keys: Sequence[str],
+    ttl: int,
+    loader: Callable[[List[int]], Awaitable[List[Union[str, BaseException]]]]
+) -> List[Union[str, BaseException]]:
+    """
+    Batch form of get_or_set: one MGET for all keys, then a single loader
+    call with the indices of the misses (one index per distinct missing key).
+
+    Exceptions returned by the loader are passed through to the caller and
+    not cached; Redis errors are treated as misses as in get_or_set.
+    """
+    if not keys:
+        return []
+
+    redis = get_redis()
+
+    try:
+        cached = await redis.mget(keys)
+    except RedisError as e:
+        logger.warning(f"Cache read failed for {len(keys)} keys: {e}")
+        cached = [None] * len(keys)
+
+    results: List[Union[str, BaseException, None]] = [
+        value.decode("utf-8") if value is not None else None for value in cached
+    ]
+    # A key repeated among the misses (e.g. a running header) is loaded once
+    # and its result shared by every position
+    first_miss = {}
+    for i, value in enumerate(results):
+        if value is None:
+            first_miss.setdefault(keys[i], i)
+    if not first_miss:
+        return results
+
+    misses = list(first_miss.values())
+    loaded = await loader(misses)
+    loaded_by_key = {keys[i]: value for i, value in zip(misses, loaded)}
+
+    pipe = redis.pipeline(transaction=False)
+    for key, value in loaded_by_key.items():
+        if isinstance(value, str):
+            pipe.set(key, value, ex=ttl)
+    for i, value in enumerate(results):
+        if value is None:
+            results[i] = loaded_by_key[keys[i]]
+
+    try:
+        await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Cache write failed for {len(misses)} keys: {e}")
+
+    return results
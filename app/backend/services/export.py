@@ -1,25 +1,214 @@
 import asyncio
 import logging
 import zipfile
-import tempfile
+from collections import deque
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Callable, List, Dict, Optional
 from datetime import datetime
-from jinja2 import Template
+from jinja2 import DictLoader, Environment
+from xml.sax.saxutils import escape
 import uuid
 
 from app.shared.schemas import Book, Page, Block, Export
-from app.shared.constants import EXPORTS_DIR, CHINESE_FONTS
-from .typesetting import TypesettingEngine
+from app.shared.constants import EXPORTS_DIR, EXPORT_RENDER_AHEAD, FONTS_DIR, CHINESE_FONTS
+from app.shared.utils.chinese_typography import sanitize_inline_markup
+from .typesetting import get_typesetting_engine
 
 logger = logging.getLogger(__name__)
 
+# Static ePub entries, encoded once at import
+_MIMETYPE = b"application/epub+zip"
+_CONTAINER_XML = b'''<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+    <rootfiles>
+        <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+    </rootfiles>
+</container>'''
+
+# ePub template sources; compiled once by _ENV below
+_OPF_SRC = '''<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">
+        <dc:identifier id="bookid">urn:uuid:{{ book_id }}</dc:identifier>
+        <dc:title>{{ title }}</dc:title>
+        <dc:language>zh-CN</dc:language>
+        <dc:creator>GPTrans</dc:creator>
+        <meta property="dcterms:modified">{{ timestamp }}</meta>
+        <meta name="cover" content="cover-image"/>
+    </metadata>
+    
+    <manifest>
+        <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+        <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+        <item id="css" href="css/styles.css" media-type="text/css"/>
+        <item id="font-serif" href="fonts/NotoSerifCJKsc-Regular.otf" media-type="font/otf"/>
+        <item id="font-sans" href="fonts/NotoSansCJKsc-Regular.otf" media-type="font/otf"/>
+        {{ manifest_items }}
+    </manifest>
+    
+    <spine toc="ncx">
+        {{ spine_items }}
+    </spine>
+</package>'''
+
+_NCX_SRC = '''<?xml version="1.0" encoding="UTF-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+    <head>
+        <meta name="dtb:uid" content="urn:uuid:{{ book_id }}"/>
+        <meta name="dtb:depth" content="1"/>
+        <meta name="dtb:totalPageCount" content="{{ page_count }}"/>
+        <meta name="dtb:maxPageNumber" content="{{ page_count }}"/>
+    </head>
+    
+    <docTitle>
+        <text>{{ title }}</text>
+    </docTitle>
+    
+    <navMap>
+        {{ nav_points }}
+    </navMap>
+</ncx>'''
+
+_NAV_SRC = '''<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head>
+    <title>目录</title>
+    <link rel="stylesheet" type="text/css" href="css/styles.css"/>
+</head>
+<body>
+    <nav epub:type="toc" id="toc">
+        <h1>目录</h1>
+        <ol>
+            {{ toc_entries }}
+        </ol>
+    </nav>
+</body>
+</html>'''
+
+# Chapter XHTML is a fixed shell around one div per frame; plain %-formatting
+# builds it much faster than rendering a Jinja template per page
+_CHAPTER_HEAD = '''<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+    <title>第%d页</title>
+    <link rel="stylesheet" type="text/css" href="css/styles.css"/>
+</head>
+<body>
+    <div class="page-content">
+'''
+_CHAPTER_FRAME = '''        <div class="%s" data-block-id="%s">
+            %s
+        </div>
+'''
+_CHAPTER_TAIL = '''    </div>
+</body>
+</html>'''
+
+# One environment compiles the ePub package templates at import. The
+# templates only receive prebuilt markup or values escaped by the caller, so
+# autoescape is off and no per-variable escape filter runs while rendering
+_ENV = Environment(
+    loader=DictLoader({
+        "opf": _OPF_SRC,
+        "ncx": _NCX_SRC,
+        "nav": _NAV_SRC,
+    }),
+    autoescape=False,
+    auto_reload=False
+)
+_OPF_TEMPLATE = _ENV.get_template("opf")
+_NCX_TEMPLATE = _ENV.get_template("ncx")
+_NAV_TEMPLATE = _ENV.get_template("nav")
+
+# ePub stylesheet; depends only on module constants, so build and encode it once
+_EPUB_CSS_BYTES = f'''
+@font-face {{
+    font-family: "Noto Serif CJK SC";
+    src: url("../fonts/NotoSerifCJKsc-Regular.otf") format("opentype");
+    font-weight: normal;
+    font-style: normal;
+}}
+
+@font-face {{
+    font-family: "Noto Sans CJK SC";  
+    src: url("../fonts/NotoSansCJKsc-Regular.otf") format("opentype");
+    font-weight: normal;
+    font-style: normal;
+}}
+
+body {{
+    font-family: "{CHINESE_FONTS["serif"]}", serif;
+    font-size: 16px;
+    line-height: 1.6;
+    margin: 0;
+    padding: 20px;
+    color: #333;
+    text-align: justify;
+    text-justify: inter-ideograph;
+    line-break: strict;
+    word-break: keep-all;
+}}
+
+h1, h2, h3 {{
+    font-family: "{CHINESE_FONTS["sans"]}", sans-serif;
+    font-weight: bold;
+    text-align: center;
+    margin: 24px 0 16px 0;
+}}
+
+p {{
+    text-indent: 2em;
+    margin: 0 0 12px 0;
+}}
+
+.heading {{
+    font-size: 20px;
+    font-weight: bold;
+    text-align: center;
+    margin: 24px 0 16px 0;
+}}
+
+.caption {{
+    font-size: 14px;
+    text-align: center;
+    font-style: italic;
+    color: #666;
+    margin: 8px 0;
+}}
+
+.footnote {{
+    font-size: 12px;
+    color: #555;
+    margin: 4px 0;
+    text-indent: 1em;
+}}
+
+.page-break {{
+    page-break-before: always;
+}}
+'''.encode("utf-8")
+
+
+# Fonts embedded in every ePub, referenced by the manifest and stylesheet
+_EPUB_FONTS = ("NotoSerifCJKsc-Regular.otf", "NotoSansCJKsc-Regular.otf")
+
+
+@lru_cache(maxsize=None)
+def _load_font(name: str) -> bytes:
+    """Read a font file once per process; missing fonts embed as empty placeholders."""
+    try:
+        return (FONTS_DIR / name).read_bytes()
+    except FileNotFoundError:
+        logger.warning(f"Font {name} not found in {FONTS_DIR}, embedding an empty placeholder")
+        return b""
+
 
 class ExportService:
     """Service for exporting books to various formats."""
     
     def __init__(self):
-        self.typesetting_engine = TypesettingEngine()
+        self.typesetting_engine = get_typesetting_engine()
     
     async def export_book(
         self, 
@@ -78,7 +267,8 @@ class ExportService:
             # Create download archive if multiple formats
             if len(export_files) > 1:
                 archive_path = export_dir / f"{book.title}_export.zip"
-                self._create_archive(export_files, archive_path)
+                # Copying the exports into the archive is blocking file I/O
+                await asyncio.to_thread(self._create_archive, export_files, archive_path)
                 return f"/static/exports/{export_id}/{archive_path.name}"
             else:
                 return f"/static/exports/{export_id}/{export_files[0].name}"
@@ -104,282 +294,163 @@ class ExportService:
             True if successful, False otherwise
         """
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                temp_path = Path(temp_dir)
-                
-                # Create ePub structure
-                await self._create_epub_structure(temp_path, book, typeset_pages)
-                
-                # Create ePub archive
-                self._create_epub_archive(temp_path, epub_path)
-                
-                return True
+            # Level 1 deflate: small, repetitive XHTML compresses nearly as well
+            # as the default level 6 at a fraction of the CPU cost
+            with zipfile.ZipFile(
+                epub_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1
+            ) as epub_zip:
+                # Entries are written straight into the archive; nothing is staged on disk
+                await self._create_epub_structure(epub_zip.writestr, book, typeset_pages)
+            
+            return True
         
         except Exception as e:
             logger.error(f"ePub export failed: {e}")
             return False
     
-    async def _create_epub_structure(self, temp_path: Path, book: Book, typeset_pages: List):
-        """Create ePub3 file structure."""
+    async def _create_epub_structure(self, write: Callable[..., None], book: Book, typeset_pages: List):
+        """
+        Create ePub3 file structure.
         
-        # Create directories
-        meta_inf_dir = temp_path / "META-INF"
-        oebps_dir = temp_path / "OEBPS"
-        css_dir = oebps_dir / "css"
-        fonts_dir = oebps_dir / "fonts"
+        Args:
+            write: Archive writer taking (arcname, data[, compress_type]),
+                e.g. ZipFile.writestr; directories are implied by entry names
+            book: Book metadata
+            typeset_pages: Typeset pages with frames
+        """
         
-        meta_inf_dir.mkdir()
-        oebps_dir.mkdir()
-        css_dir.mkdir()
-        fonts_dir.mkdir()
+        # mimetype must come first and be stored uncompressed
+        write("mimetype", _MIMETYPE, compress_type=zipfile.ZIP_STORED)
         
-        # mimetype file
-        (temp_path / "mimetype").write_text("application/epub+zip", encoding="utf-8")
+        write("META-INF/container.xml", _CONTAINER_XML)
         
-        # META-INF/container.xml
-        container_xml = '''<?xml version="1.0" encoding="UTF-8"?>
-<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
-    <rootfiles>
-        <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
-    </rootfiles>
-</container>'''
-        (meta_inf_dir / "container.xml").write_text(container_xml, encoding="utf-8")
+        # CSS file
+        write("OEBPS/css/styles.css", _EPUB_CSS_BYTES)
         
-        # OEBPS/content.opf
-        opf_content = self._generate_opf_content(book, typeset_pages)
-        (oebps_dir / "content.opf").write_text(opf_content, encoding="utf-8")
+        # One identifier shared by the OPF package and the NCX dtb:uid
+        book_uuid = str(uuid.uuid4())
         
-        # OEBPS/toc.ncx
-        ncx_content = self._generate_ncx_content(book, typeset_pages)
-        (oebps_dir / "toc.ncx").write_text(ncx_content, encoding="utf-8")
+        # Package documents are independent, so render them concurrently
+        # in worker threads
+        names = [
+            "OEBPS/content.opf",
+            "OEBPS/toc.ncx",
+            "OEBPS/nav.xhtml",  # ePub3 navigation
+        ]
+        documents = await asyncio.gather(
+            asyncio.to_thread(self._generate_opf_content, book, typeset_pages, book_uuid),
+            asyncio.to_thread(self._generate_ncx_content, book, typeset_pages, book_uuid),
+            asyncio.to_thread(self._generate_nav_content, book, typeset_pages)
+        )
         
-        # OEBPS/nav.xhtml (ePub3 navigation)
-        nav_content = self._generate_nav_content(book, typeset_pages)
-        (oebps_dir / "nav.xhtml").write_text(nav_content, encoding="utf-8")
+        for name, document in zip(names, documents):
+            write(name, document)
         
-        # CSS file
-        css_content = self._generate_epub_css()
-        (css_dir / "styles.css").write_text(css_content, encoding="utf-8")
+        # Chapters are written to the archive as they are rendered, so only
+        # a bounded window of them is ever held in memory
+        chapter_num = 0
+        async for document in self._iter_chapters(typeset_pages):
+            chapter_num += 1
+            write(f"OEBPS/chapter{chapter_num:02d}.xhtml", document)
         
-        # Chapter HTML files
-        for i, page in enumerate(typeset_pages):
-            chapter_content = self._generate_chapter_html(page, i + 1)
-            (oebps_dir / f"chapter{i+1:02d}.xhtml").write_text(chapter_content, encoding="utf-8")
+        # Font files; OTF data is already compressed, so store it as-is
+        for font_name in _EPUB_FONTS:
+            write(f"OEBPS/fonts/{font_name}", _load_font(font_name), compress_type=zipfile.ZIP_STORED)
+    
+    async def _iter_chapters(
+        self,
+        typeset_pages: List,
+        render_ahead: int = EXPORT_RENDER_AHEAD
+    ) -> AsyncIterator[bytes]:
+        """
+        Render chapter XHTML in worker threads and yield it in page order.
         
-        # Copy font files (would need actual font files in production)
-        # For now, create placeholder files
-        (fonts_dir / "NotoSerifCJKsc-Regular.otf").write_text("", encoding="utf-8")
-        (fonts_dir / "NotoSansCJKsc-Regular.otf").write_text("", encoding="utf-8")
+        Up to `render_ahead` chapters are rendered ahead of the one being
+        consumed, so rendering overlaps with archive writes while memory
+        stays bounded.
+        """
+        pending = deque()
+        pages = enumerate(typeset_pages, 1)
+        try:
+            for chapter_num, page in pages:
+                pending.append(asyncio.ensure_future(
+                    asyncio.to_thread(self._generate_chapter_html, page, chapter_num)
+                ))
+                if len(pending) >= render_ahead:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            # The writer failed; don't leave chapters rendering
+            for task in pending:
+                task.cancel()
     
-    def _generate_opf_content(self, book: Book, typeset_pages: List) -> str:
+    def _generate_opf_content(self, book: Book, typeset_pages: List, book_uuid: str) -> str:
         """Generate OPF package file content."""
         
-        template = Template('''<?xml version="1.0" encoding="UTF-8"?>
-<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid">
-    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:opf="http://www.idpf.org/2007/opf">
-        <dc:identifier id="bookid">urn:uuid:{{ book_id }}</dc:identifier>
-        <dc:title>{{ title }}</dc:title>
-        <dc:language>zh-CN</dc:language>
-        <dc:creator>GPTrans</dc:creator>
-        <meta property="dcterms:modified">{{ timestamp }}</meta>
-        <meta name="cover" content="cover-image"/>
-    </metadata>
-    
-    <manifest>
-        <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
-        <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
-        <item id="css" href="css/styles.css" media-type="text/css"/>
-        <item id="font-serif" href="fonts/NotoSerifCJKsc-Regular.otf" media-type="font/otf"/>
-        <item id="font-sans" href="fonts/NotoSansCJKsc-Regular.otf" media-type="font/otf"/>
-        {% for i in range(1, page_count + 1) %}
-        <item id="chapter{{ '%02d' | format(i) }}" href="chapter{{ '%02d' | format(i) }}.xhtml" media-type="application/xhtml+xml"/>
-        {% endfor %}
-    </manifest>
-    
-    <spine toc="ncx">
-        {% for i in range(1, page_count + 1) %}
-        <itemref idref="chapter{{ '%02d' | format(i) }}"/>
-        {% endfor %}
-    </spine>
-</package>''')
+        # Per-chapter entries are plain string formatting; building them in
+        # Python avoids a Jinja loop iteration per page
+        chapters = range(1, len(typeset_pages) + 1)
+        manifest_items = "\n        ".join(
+            f'<item id="chapter{i:02d}" href="chapter{i:02d}.xhtml" media-type="application/xhtml+xml"/>'
+            for i in chapters
+        )
+        spine_items = "\n        ".join(f'<itemref idref="chapter{i:02d}"/>' for i in chapters)
         
-        return template.render(
-            book_id=str(uuid.uuid4()),
-            title=book.title,
+        return _OPF_TEMPLATE.render(
+            book_id=book_uuid,
+            title=escape(book.title),
             timestamp=datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
-            page_count=len(typeset_pages)
+            manifest_items=manifest_items,
+            spine_items=spine_items
         )
     
-    def _generate_ncx_content(self, book: Book, typeset_pages: List) -> str:
+    def _generate_ncx_content(self, book: Book, typeset_pages: List, book_uuid: str) -> str:
         """Generate NCX table of contents."""
         
-        template = Template('''<?xml version="1.0" encoding="UTF-8"?>
-<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
-    <head>
-        <meta name="dtb:uid" content="urn:uuid:{{ book_id }}"/>
-        <meta name="dtb:depth" content="1"/>
-        <meta name="dtb:totalPageCount" content="{{ page_count }}"/>
-        <meta name="dtb:maxPageNumber" content="{{ page_count }}"/>
-    </head>
-    
-    <docTitle>
-        <text>{{ title }}</text>
-    </docTitle>
-    
-    <navMap>
-        {% for i in range(1, page_count + 1) %}
-        <navPoint id="chapter{{ '%02d' | format(i) }}" playOrder="{{ i }}">
-            <navLabel>
-                <text>第{{ i }}页</text>
-            </navLabel>
-            <content src="chapter{{ '%02d' | format(i) }}.xhtml"/>
-        </navPoint>
-        {% endfor %}
-    </navMap>
-</ncx>''')
+        nav_points = "\n        ".join(
+            f'<navPoint id="chapter{i:02d}" playOrder="{i}">'
+            f'<navLabel><text>第{i}页</text></navLabel>'
+            f'<content src="chapter{i:02d}.xhtml"/></navPoint>'
+            for i in range(1, len(typeset_pages) + 1)
+        )
         
-        return template.render(
-            book_id=str(uuid.uuid4()),
-            title=book.title,
-            page_count=len(typeset_pages)
+        return _NCX_TEMPLATE.render(
+            book_id=book_uuid,
+            title=escape(book.title),
+            page_count=len(typeset_pages),
+            nav_points=nav_points
         )
     
     def _generate_nav_content(self, book: Book, typeset_pages: List) -> str:
         """Generate ePub3 navigation document."""
         
-        template = Template('''<?xml version="1.0" encoding="UTF-8"?>
-<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
-<head>
-    <title>目录</title>
-    <link rel="stylesheet" type="text/css" href="css/styles.css"/>
-</head>
-<body>
-    <nav epub:type="toc" id="toc">
-        <h1>目录</h1>
-        <ol>
-            {% for i in range(1, page_count + 1) %}
-            <li><a href="chapter{{ '%02d' | format(i) }}.xhtml">第{{ i }}页</a></li>
-            {% endfor %}
-        </ol>
-    </nav>
-</body>
-</html>''')
-        
-        return template.render(page_count=len(typeset_pages))
-    
-    def _generate_epub_css(self) -> str:
-        """Generate CSS for ePub."""
+        toc_entries = "\n            ".join(
+            f'<li><a href="chapter{i:02d}.xhtml">第{i}页</a></li>'
+            for i in range(1, len(typeset_pages) + 1)
+        )
         
-        return f'''
-@font-face {{
-    font-family: "Noto Serif CJK SC";
-    src: url("../fonts/NotoSerifCJKsc-Regular.otf") format("opentype");
-    font-weight: normal;
-    font-style: normal;
-}}
-
-@font-face {{
-    font-family: "Noto Sans CJK SC";  
-    src: url("../fonts/NotoSansCJKsc-Regular.otf") format("opentype");
-    font-weight: normal;
-    font-style: normal;
-}}
-
-body {{
-    font-family: "{CHINESE_FONTS["serif"]}", serif;
-    font-size: 16px;
-    line-height: 1.6;
-    margin: 0;
-    padding: 20px;
-    color: #333;
-    text-align: justify;
-    text-justify: inter-ideograph;
-    line-break: strict;
-    word-break: keep-all;
-}}
-
-h1, h2, h3 {{
-    font-family: "{CHINESE_FONTS["sans"]}", sans-serif;
-    font-weight: bold;
-    text-align: center;
-    margin: 24px 0 16px 0;
-}}
-
-p {{
-    text-indent: 2em;
-    margin: 0 0 12px 0;
-}}
-
-.heading {{
-    font-size: 20px;
-    font-weight: bold;
-    text-align: center;
-    margin: 24px 0 16px 0;
-}}
-
-.caption {{
-    font-size: 14px;
-    text-align: center;
-    font-style: italic;
-    color: #666;
-    margin: 8px 0;
-}}
-
-.footnote {{
-    font-size: 12px;
-    color: #555;
-    margin: 4px 0;
-    text-indent: 1em;
-}}
-
-.page-break {{
-    page-break-before: always;
-}}
-'''
+        return _NAV_TEMPLATE.render(toc_entries=toc_entries)
     
-    def _generate_chapter_html(self, page, chapter_num: int) -> str:
+    def _generate_chapter_html(self, page, chapter_num: int) -> bytes:
         """Generate HTML content for a chapter/page."""
         
-        template = Template('''<?xml version="1.0" encoding="UTF-8"?>
-<html xmlns="http://www.w3.org/1999/xhtml">
-<head>
-    <title>第{{ chapter_num }}页</title>
-    <link rel="stylesheet" type="text/css" href="css/styles.css"/>
-</head>
-<body>
-    <div class="page-content">
-        {% for frame in page.frames %}
-        <div class="{{ frame.block_type }}" data-block-id="{{ frame.block_id }}">
-            {{ frame.content | replace('\n', '<br/>') | safe }}
-        </div>
-        {% endfor %}
-    </div>
-</body>
-</html>''')
-        
-        # Add block type to frames for CSS styling
-        for frame in page.frames:
-            frame.block_type = "paragraph"  # Default, could be extracted from block data
-        
-        return template.render(page=page, chapter_num=chapter_num)
-    
-    def _create_epub_archive(self, temp_path: Path, epub_path: Path):
-        """Create ePub ZIP archive."""
-        
-        with zipfile.ZipFile(epub_path, 'w', zipfile.ZIP_DEFLATED) as epub_zip:
-            # Add mimetype first (uncompressed)
-            mimetype_path = temp_path / "mimetype"
-            epub_zip.write(mimetype_path, "mimetype", compress_type=zipfile.ZIP_STORED)
-            
-            # Add all other files
-            for file_path in temp_path.rglob("*"):
-                if file_path.is_file() and file_path.name != "mimetype":
-                    arcname = str(file_path.relative_to(temp_path))
-                    epub_zip.write(file_path, arcname)
+        # Frame content is escaped with the same inline-tag allowlist as the
+        # PDF; frames without a block type render as paragraphs
+        frames = "".join(
+            _CHAPTER_FRAME % (
+                getattr(frame, "block_type", "paragraph"),
+                frame.block_id,
+                sanitize_inline_markup(frame.content)
+            )
+            for frame in page.frames
+        )
+        return (_CHAPTER_HEAD % chapter_num + frames + _CHAPTER_TAIL).encode("utf-8")
     
     def _create_archive(self, files: List[Path], archive_path: Path):
         """Create ZIP archive of multiple export files."""
         
-        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        # PDF and ePub are already compressed, so store them as-is
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as archive:
             for file_path in files:
                 archive.write(file_path, file_path.name)
\ No newline at end of file
@@ -1,57 +1,244 @@
 import os
 import re
 import asyncio
-from typing import Dict, List, Optional
+import bisect
+import itertools
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 from abc import ABC, abstractmethod
 
 from app.shared.schemas import GlossaryTerm
+from app.shared.constants import TRANSLATION_CONCURRENCY
+
+
+def _word_substitution(words: Dict[str, str], suffixes: Dict[str, str]):
+    """
+    Compile word and suffix replacement tables into one case-insensitive regex.
+    
+    A single alternation scans the text once instead of once per pattern;
+    each key is its own group, so a match is resolved by its group index
+    (re-lowercasing the match would miss IGNORECASE folds such as 'ſ' -> 's').
+    """
+    replacements, alternatives = [], []
+    for keys, prefix in ((words, r'\b'), (suffixes, '')):
+        if keys:
+            ordered = sorted(keys, key=len, reverse=True)
+            replacements.extend(keys[key] for key in ordered)
+            grouped = '|'.join(f'({re.escape(key)})' for key in ordered)
+            alternatives.append(rf'{prefix}(?:{grouped})\b')
+    pattern = re.compile('|'.join(alternatives), re.IGNORECASE)
+    return lambda text: pattern.sub(lambda m: replacements[m.lastindex - 1], text)
+
+
+# Substitutions for the mock providers, compiled once at import
+_DE_SUBSTITUTE = _word_substitution(
+    words={
+        'der': '这个',
+        'die': '这个',
+        'das': '这个',
+        'und': '和',
+        'in': '在',
+        'mit': '用',
+        'von': '来自',
+        'zu': '到',
+        'ist': '是',
+        'wird': '被',
+        'wurde': '被',
+        'sich': '',
+    },
+    suffixes={
+        'ung': '化',
+        'tion': '动',
+        'ität': '性',
+    }
+)
+
+_SV_SUBSTITUTE = _word_substitution(
+    words={
+        'en': '一个',
+        'ett': '一个',
+        'och': '和',
+        'i': '在',
+        'av': '的',
+        'för': '为了',
+        'som': '如',
+        'är': '是',
+    },
+    suffixes={}
+)
+
+
+def _phrase_substitution(terms: Iterable[Tuple[str, str, bool]]):
+    """
+    Compile (src, tgt, case_sensitive) phrase terms into one regex.
+    
+    Longer phrases are tried first, case-sensitive ones ahead of others of
+    the same length; case-insensitive terms use scoped inline flags so both
+    kinds share the same alternation. Each term is its own group and a match
+    is resolved by group index, since the matched text of a case-insensitive
+    term need not lowercase to the term ('ſ' folds to 's').
+    """
+    replacements, alternatives = [], []
+    for src, tgt, case_sensitive in sorted(terms, key=lambda t: (len(t[0]), t[2]), reverse=True):
+        if not src:
+            continue
+        replacements.append(tgt)
+        if case_sensitive:
+            alternatives.append(f'({re.escape(src)})')
+        else:
+            alternatives.append(f'((?i:{re.escape(src)}))')
+    
+    if not alternatives:
+        return lambda text: text
+    
+    pattern = re.compile('|'.join(alternatives))
+    return lambda text: pattern.sub(lambda m: replacements[m.lastindex - 1], text)
+
+
+# Mock phrase tables, shared read-only by every provider instance
+_MOCK_PHRASES = MappingProxyType({
+    "de": {
+        "Die Entwicklung der modernen Typografie": "现代字体设计的发展",
+        "Die Geschichte der Typografie": "字体排印史",
+        "Johannes Gutenberg": "约翰内斯·古腾堡",
+        "beweglichen Lettern": "活字印刷",
+        "Renaissance": "文艺复兴",
+        "humanistische Minuskel": "人文主义小写字母",
+        "Gutenberg-Bible": "古腾堡圣经",
+        "Mainz": "美因茨"
+    },
+    "sv": {
+        "Typografins utveckling": "字体设计的发展",
+        "Modern design": "现代设计",
+        "Tryckkonst": "印刷艺术"
+    }
+})
+
+# Each phrase table is applied in a single regex pass
+_MOCK_PHRASE_SUBSTITUTIONS = MappingProxyType({
+    lang: _phrase_substitution((src, tgt, False) for src, tgt in table.items())
+    for lang, table in _MOCK_PHRASES.items()
+})
+
+
+@lru_cache(maxsize=64)
+def _glossary_substitution(glossary_key: Tuple[Tuple[str, str, bool], ...]):
+    """Get the compiled substitution for a glossary, compiling it on first use."""
+    return _phrase_substitution(glossary_key)
+
+
+_CONCISE_PATTERNS = [re.compile(pattern) for pattern in [
+    r'，这个',
+    r'的这个',
+    r'，它',
+    r'，该',
+    r'，其',
+    r'所谓的',
+    r'也就是说',
+    r'换句话说',
+]]
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# At least three non-ASCII characters, i.e. the mock produced some Chinese;
+# the character classes are disjoint, so the search is linear and stops early
+_TRANSLATED_RE = re.compile(r'[^\x00-\x7f](?:[\x00-\x7f]*[^\x00-\x7f]){2}')
+
+# Placeholders and inline markup that must survive translation untouched;
+# literal key brackets in the source are protected too, so any bracket left
+# in a translation after restoring can only be a mangled key
+_PLACEHOLDER_RE = re.compile(r'(\{[^}]+\}|<[^>]+>[^<]*</[^>]+>|<[^/>]+/>|[⟦⟧])')
+
+# Placeholders and bare tags, which carry no translatable words themselves
+_MARKUP_RE = re.compile(r'\{[^}]+\}|</?[^>]+>')
+_WORD_CHAR_RE = re.compile(r'\w')
+
+# Bracketed index that stands in for a placeholder during translation. The
+# brackets are printable (so a mangled key can't put control characters in
+# the database) and no substitution pattern touches them
+_PLACEHOLDER_KEY_RE = re.compile(r'⟦(\d+)⟧')
+_PLACEHOLDER_KEY_PARTS = frozenset('⟦⟧')
+
+
+def _excerpt(text: str, limit: int) -> str:
+    """Cut text to at most limit characters without splitting a placeholder key."""
+    excerpt = text[:limit]
+    start = excerpt.rfind('⟦')
+    if start != -1 and '⟧' not in excerpt[start:]:
+        excerpt = excerpt[:start]
+    return excerpt
 
 
 class TranslationProvider(ABC):
     """Abstract base class for translation providers."""
     
+    @property
+    @abstractmethod
+    def cache_tag(self) -> str:
+        """
+        Identify the provider and model whose output this is.
+        
+        Part of every translation cache key, so results from one provider or
+        model are never served for another; bump it when output changes.
+        """
+        pass
+    
     @abstractmethod
     async def translate_text(
         self,
         text: str,
         source_lang: str,
         target_lang: str,
-        glossary: Optional[List[GlossaryTerm]] = None,
+        glossary: Optional[Sequence[GlossaryTerm]] = None,
         length_policy: str = "normal"
     ) -> str:
         """Translate text from source to target language."""
         pass
+    
+    async def translate_batch(
+        self,
+        texts: List[str],
+        source_lang: str,
+        target_lang: str,
+        glossary: Optional[Sequence[GlossaryTerm]] = None,
+        length_policy: str = "normal",
+        return_exceptions: bool = False
+    ) -> List[Union[str, BaseException]]:
+        """
+        Translate several texts, returning results in input order.
+        
+        Providers with a native batch endpoint override this; the default
+        runs translate_text concurrently, bounded by TRANSLATION_CONCURRENCY.
+        """
+        semaphore = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+        
+        async def translate(text: str) -> str:
+            async with semaphore:
+                return await self.translate_text(
+                    text, source_lang, target_lang, glossary, length_policy
+                )
+        
+        return await asyncio.gather(
+            *(translate(text) for text in texts),
+            return_exceptions=return_exceptions
+        )
 
 
 class MockTranslationProvider(TranslationProvider):
     """Mock translation provider for testing and development."""
     
-    def __init__(self):
-        # Sample translations for common German/Swedish phrases
-        self.translations = {
-            "de": {
-                "Die Entwicklung der modernen Typografie": "现代字体设计的发展",
-                "Die Geschichte der Typografie": "字体排印史",
-                "Johannes Gutenberg": "约翰内斯·古腾堡",
-                "beweglichen Lettern": "活字印刷",
-                "Renaissance": "文艺复兴",
-                "humanistische Minuskel": "人文主义小写字母",
-                "Gutenberg-Bible": "古腾堡圣经",
-                "Mainz": "美因茨"
-            },
-            "sv": {
-                "Typografins utveckling": "字体设计的发展",
-                "Modern design": "现代设计",
-                "Tryckkonst": "印刷艺术"
-            }
-        }
+    # Sample translations for common German/Swedish phrases
+    translations = _MOCK_PHRASES
+    
+    cache_tag = "mock:1"
     
     async def translate_text(
         self,
         text: str,
         source_lang: str,
         target_lang: str,
-        glossary: Optional[List[GlossaryTerm]] = None,
+        glossary: Optional[Sequence[GlossaryTerm]] = None,
         length_policy: str = "normal"
     ) -> str:
         """Mock translation with basic word substitution and length control."""
@@ -61,19 +248,12 @@ class MockTranslationProvider(TranslationProvider):
         
         # Apply glossary terms first
         if glossary:
-            for term in glossary:
-                if term.case_sensitive:
-                    translated = translated.replace(term.src, term.tgt)
-                else:
-                    pattern = re.compile(re.escape(term.src), re.IGNORECASE)
-                    translated = pattern.sub(term.tgt, translated)
+            glossary_key = tuple((term.src, term.tgt, term.case_sensitive) for term in glossary)
+            translated = _glossary_substitution(glossary_key)(translated)
         
         # Apply built-in translations
-        if source_lang in self.translations:
-            for src, tgt in self.translations[source_lang].items():
-                if src.lower() in translated.lower():
-                    pattern = re.compile(re.escape(src), re.IGNORECASE)
-                    translated = pattern.sub(tgt, translated)
+        if source_lang in _MOCK_PHRASE_SUBSTITUTIONS:
+            translated = _MOCK_PHRASE_SUBSTITUTIONS[source_lang](translated)
         
         # Basic German to Chinese translation logic
         if source_lang == "de" and target_lang == "zh-CN":
@@ -90,58 +270,25 @@ class MockTranslationProvider(TranslationProvider):
     def _mock_german_to_chinese(self, text: str) -> str:
         """Mock German to Chinese translation."""
         # Simple word-by-word substitution for common patterns
-        patterns = {
-            r'\bder\b': '这个',
-            r'\bdie\b': '这个',  
-            r'\bdas\b': '这个',
-            r'\bund\b': '和',
-            r'\bin\b': '在',
-            r'\bmit\b': '用',
-            r'\bvon\b': '来自',
-            r'\bzu\b': '到',
-            r'\bist\b': '是',
-            r'\bwird\b': '被',
-            r'\bwurde\b': '被',
-            r'\bsich\b': '',
-            r'ung\b': '化',
-            r'tion\b': '动',
-            r'ität\b': '性',
-        }
-        
-        result = text
-        for pattern, replacement in patterns.items():
-            result = re.sub(pattern, replacement, result, flags=re.IGNORECASE)
+        result = _DE_SUBSTITUTE(text)
         
         # Clean up multiple spaces
-        result = re.sub(r'\s+', '', result)
+        result = _WHITESPACE_RE.sub('', result)
         
         # If no translation occurred, provide a generic Chinese text
-        if result == text or len([c for c in result if ord(c) > 127]) < 3:
-            result = f"这是一段从德语翻译过来的文本：{text[:20]}..."
+        if result == text or not _TRANSLATED_RE.search(_PLACEHOLDER_KEY_RE.sub('', result)):
+            result = f"这是一段从德语翻译过来的文本：{_excerpt(text, 20)}..."
         
         return result
     
     def _mock_swedish_to_chinese(self, text: str) -> str:
         """Mock Swedish to Chinese translation."""
-        patterns = {
-            r'\ben\b': '一个',
-            r'\bett\b': '一个',
-            r'\boch\b': '和',
-            r'\bi\b': '在',
-            r'\bav\b': '的',
-            r'\bför\b': '为了',
-            r'\bsom\b': '如',
-            r'\bär\b': '是',
-        }
-        
-        result = text
-        for pattern, replacement in patterns.items():
-            result = re.sub(pattern, replacement, result, flags=re.IGNORECASE)
+        result = _SV_SUBSTITUTE(text)
         
-        result = re.sub(r'\s+', '', result)
+        result = _WHITESPACE_RE.sub('', result)
         
-        if result == text or len([c for c in result if ord(c) > 127]) < 3:
-            result = f"这是一段从瑞典语翻译过来的文本：{text[:20]}..."
+        if result == text or not _TRANSLATED_RE.search(_PLACEHOLDER_KEY_RE.sub('', result)):
+            result = f"这是一段从瑞典语翻译过来的文本：{_excerpt(text, 20)}..."
         
         return result
     
@@ -152,30 +299,23 @@ class MockTranslationProvider(TranslationProvider):
         
         target_length = int(len(text) * target_ratio)
         
-        # Simple strategy: remove common filler words and redundant phrases
-        concise_patterns = [
-            r'，这个',
-            r'的这个',
-            r'，它',
-            r'，该',
-            r'，其',
-            r'所谓的',
-            r'也就是说',
-            r'换句话说',
-        ]
-        
+        # Simple strategy: remove common filler words and redundant phrases,
+        # stopping as soon as the text fits (removals only shorten it)
         result = text
-        for pattern in concise_patterns:
-            if len(result) > target_length:
-                result = re.sub(pattern, '', result)
+        for pattern in _CONCISE_PATTERNS:
+            if len(result) <= target_length:
+                break
+            result = pattern.sub('', result)
         
         # If still too long, truncate sentences
         if len(result) > target_length:
+            # Keep the longest sentence prefix that fits (at least one);
+            # ends[k] is the joined length of the first k+1 sentences plus one
             sentences = result.split('。')
-            while len('。'.join(sentences)) > target_length and len(sentences) > 1:
-                sentences.pop()
-            result = '。'.join(sentences)
-            if not result.endswith('。') and sentences:
+            ends = list(itertools.accumulate(len(sentence) + 1 for sentence in sentences))
+            keep = max(bisect.bisect_right(ends, target_length + 1), 1)
+            result = '。'.join(sentences[:keep])
+            if not result.endswith('。'):
                 result += '。'
         
         return result or text  # Fallback to original if empty
@@ -187,46 +327,99 @@ class OpenAITranslationProvider(TranslationProvider):
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.model = os.getenv("OPENAI_MODEL", "gpt-4")
+        self.fallback = MockTranslationProvider()
+    
+    @property
+    def cache_tag(self) -> str:
+        # Until the API call below is implemented every translation comes
+        # from the fallback, so it must not be cached as this model's output
+        return self.fallback.cache_tag
         
     async def translate_text(
         self,
         text: str,
         source_lang: str,
         target_lang: str,
-        glossary: Optional[List[GlossaryTerm]] = None,
+        glossary: Optional[Sequence[GlossaryTerm]] = None,
         length_policy: str = "normal"
     ) -> str:
         """Translate using OpenAI API."""
         if not self.api_key:
             # Fall back to mock if no API key
-            mock_provider = MockTranslationProvider()
-            return await mock_provider.translate_text(
+            return await self.fallback.translate_text(
                 text, source_lang, target_lang, glossary, length_policy
             )
         
         # TODO: Implement actual OpenAI API call
         # For now, fall back to mock
-        mock_provider = MockTranslationProvider()
-        return await mock_provider.translate_text(
+        return await self.fallback.translate_text(
             text, source_lang, target_lang, glossary, length_policy
         )
 
 
 def get_translation_provider() -> TranslationProvider:
     """Get configured translation provider."""
-    provider_type = os.getenv("TRANSLATION_PROVIDER", "mock")
-    
+    return _create_translation_provider(os.getenv("TRANSLATION_PROVIDER", "mock"))
+
+
+@lru_cache(maxsize=None)
+def _create_translation_provider(provider_type: str) -> TranslationProvider:
+    """Create the provider once per configured type and reuse it across calls."""
     if provider_type == "openai":
         return OpenAITranslationProvider()
     else:
         return MockTranslationProvider()
 
 
+def _protect_placeholders(text: str) -> Tuple[str, List[str]]:
+    """Swap placeholders and markup for opaque keys the provider leaves alone."""
+    placeholders = [match.group(1) for match in _PLACEHOLDER_RE.finditer(text)]
+    if not placeholders:
+        return text, placeholders
+    
+    counter = itertools.count()
+    return _PLACEHOLDER_RE.sub(lambda m: f"⟦{next(counter)}⟧", text), placeholders
+
+
+def _restore_placeholders(translated: str, placeholders: List[str]) -> str:
+    """
+    Put the original placeholders back into translated text in one pass.
+    
+    Raises ValueError if the translation holds a key that doesn't match a
+    placeholder or a fragment of one, so a mangled result is never cached
+    or stored.
+    """
+    def restore(match):
+        index = int(match.group(1))
+        if index >= len(placeholders):
+            raise ValueError(f"Translation contains unknown placeholder key {match.group(0)!r}")
+        return placeholders[index]
+    
+    if not _PLACEHOLDER_KEY_PARTS.intersection(translated):
+        return translated
+    
+    # Validate against the translation with the keys taken out, since a
+    # restored placeholder may itself be a literal bracket
+    if _PLACEHOLDER_KEY_PARTS.intersection(_PLACEHOLDER_KEY_RE.sub('', translated)):
+        raise ValueError("Translation contains a partial placeholder key")
+    return _PLACEHOLDER_KEY_RE.sub(restore, translated)
+
+
+def needs_translation(text: str) -> bool:
+    """
+    Whether text has any word characters outside placeholders and tags.
+    
+    Empty, whitespace, punctuation-only and markup-only text (separators,
+    footnote markers) is returned unchanged without calling the provider.
+    """
+    return _WORD_CHAR_RE.search(_MARKUP_RE.sub('', text)) is not None
+
+
 async def translate_paragraph(
     text: str,
     source_lang: str,
     target_lang: str,
-    glossary: Optional[List[GlossaryTerm]] = None,
+    glossary: Optional[Sequence[GlossaryTerm]] = None,
     length_policy: str = "normal"
 ) -> str:
     """
@@ -242,29 +435,56 @@ async def translate_paragraph(
     Returns:
         Translated text with preserved markup
     """
-    if not text.strip():
+    if not needs_translation(text):
         return text
     
-    # Extract and preserve placeholders and markup
-    placeholders = {}
-    placeholder_pattern = r'(\{[^}]+\}|<[^>]+>[^<]*</[^>]+>|<[^/>]+/>)'
-    
-    def replace_placeholder(match):
-        key = f"__PLACEHOLDER_{len(placeholders)}__"
-        placeholders[key] = match.group(1)
-        return key
-    
-    # Replace placeholders with keys
-    text_for_translation = re.sub(placeholder_pattern, replace_placeholder, text)
+    text_for_translation, placeholders = _protect_placeholders(text)
     
-    # Translate the text
     provider = get_translation_provider()
     translated = await provider.translate_text(
         text_for_translation, source_lang, target_lang, glossary, length_policy
     )
     
-    # Restore placeholders
-    for key, value in placeholders.items():
-        translated = translated.replace(key, value)
+    return _restore_placeholders(translated, placeholders)
+
+
+async def translate_paragraphs(
+    texts: List[str],
+    source_lang: str,
+    target_lang: str,
+    glossary: Optional[Sequence[GlossaryTerm]] = None,
+    length_policy: str = "normal",
+    return_exceptions: bool = False
+) -> List[Union[str, BaseException]]:
+    """
+    Translate many paragraphs in one provider batch.
+    
+    Same per-paragraph behaviour as translate_paragraph, but the provider
+    sees all translatable paragraphs at once so it can overlap or merge the
+    requests. With return_exceptions, a failed paragraph yields its
+    exception in place instead of failing the whole batch.
+    """
+    results: List[Union[str, BaseException]] = list(texts)
+    pending = [i for i, text in enumerate(texts) if needs_translation(text)]
+    if not pending:
+        return results
+    
+    protected = [_protect_placeholders(texts[i]) for i in pending]
+    
+    provider = get_translation_provider()
+    translated = await provider.translate_batch(
+        [text for text, _ in protected], source_lang, target_lang,
+        glossary, length_policy, return_exceptions
+    )
+    
+    for i, (_, placeholders), result in zip(pending, protected, translated):
+        if not isinstance(result, BaseException):
+            try:
+                result = _restore_placeholders(result, placeholders)
+            except ValueError as e:
+                if not return_exceptions:
+                    raise
+                result = e
+        results[i] = result
     
-    return translated
\ No newline at end of file
+    return results
@@ -1,19 +1,153 @@
 import asyncio
+import itertools
 import logging
-from typing import List, Dict, Tuple, Optional
+import re
+from operator import attrgetter
+from types import MappingProxyType
+from typing import Iterator, List, Dict, Mapping, Tuple, Optional
 from pathlib import Path
-from jinja2 import Template
-import asyncio
-import subprocess
-import tempfile
+from functools import lru_cache
 
 from app.shared.schemas import TypesetFrame, TypesetPage, Block, Page, FitLoopConfig
-from app.shared.utils.chinese_typography import ChineseTypography, create_css_for_chinese_text
-from app.shared.utils.fit_loop import FitLoop, FitResult
-from app.shared.constants import CHINESE_FONTS, MM_TO_PX
+from app.shared.utils.chinese_typography import ChineseTypography, sanitize_inline_markup
+from app.shared.utils.fit_loop import CssState, FitLoop, FitResult
+from app.shared.constants import CHINESE_FONTS, FONTS_DIR, MM_TO_PX, TYPESET_CONCURRENCY
+
+try:
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+except ImportError:  # Optional in development; PDF rendering then reports failure
+    HTML = None
+
+# Default frame CSS per block type, built once and shared read-only by all
+# frames; copy with dict() before modifying
+_BASE_CSS = MappingProxyType({
+    "font-family": f'"{CHINESE_FONTS["serif"]}", serif',
+    "text-align": "justify",
+    "text-justify": "inter-ideograph",
+    "line-break": "strict",
+    "word-break": "keep-all",
+    "hyphens": "none",
+    "margin": "0",
+    "padding": "0"
+})
+
+_CSS_BY_BLOCK_TYPE = {
+    "heading": MappingProxyType({
+        **_BASE_CSS,
+        "font-size": "20px",
+        "font-weight": "bold",
+        "line-height": "1.3",
+        "text-align": "center",
+        "margin-bottom": "16px"
+    }),
+    "paragraph": MappingProxyType({
+        **_BASE_CSS,
+        "font-size": "16px",
+        "line-height": "1.6",
+        "text-indent": "2em",
+        "margin-bottom": "12px"
+    }),
+    "caption": MappingProxyType({
+        **_BASE_CSS,
+        "font-size": "14px",
+        "line-height": "1.4",
+        "text-align": "center",
+        "font-style": "italic",
+        "color": "#666"
+    }),
+    "footnote": MappingProxyType({
+        **_BASE_CSS,
+        "font-size": "12px",
+        "line-height": "1.3",
+        "text-indent": "1em",
+        "color": "#555"
+    }),
+    "figure": MappingProxyType({
+        **_BASE_CSS,
+        "text-align": "center",
+        "margin": "16px 0"
+    }),
+    "page-number": MappingProxyType({
+        **_BASE_CSS,
+        "font-size": "12px",
+        "text-align": "center",
+        "color": "#888"
+    }),
+}
 
 logger = logging.getLogger(__name__)
 
+CSS_METRICS_CACHE_SIZE = 1024
+CSS_INTERN_CACHE_SIZE = 1024
+
+# Print/PDF document pieces; the document is streamed out frame by frame
+# instead of rendering one large template
+_HTML_HEAD = """
+<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Typeset Document</title>
+    <style>
+        @font-face {
+            font-family: "Noto Serif CJK SC";
+            src: url("fonts/NotoSerifCJKsc-Regular.otf") format("opentype");
+            font-weight: normal;
+            font-style: normal;
+        }
+        
+        @font-face {
+            font-family: "Noto Sans CJK SC";  
+            src: url("fonts/NotoSansCJKsc-Regular.otf") format("opentype");
+            font-weight: normal;
+            font-style: normal;
+        }
+        
+        body {
+            margin: 0;
+            padding: 0;
+            font-family: "Noto Serif CJK SC", serif;
+            background-color: white;
+        }
+        
+        .page {
+            position: relative;
+            width: %(page_width)spx;
+            height: %(page_height)spx;
+            margin: 20px auto;
+            background: white;
+            box-shadow: 0 0 10px rgba(0,0,0,0.1);
+            page-break-after: always;
+        }
+        
+        .frame {
+            position: absolute;
+            overflow: hidden;
+        }
+        
+        @media print {
+            .page {
+                margin: 0;
+                box-shadow: none;
+                page-break-after: always;
+            }
+        }
+    </style>
+</head>
+<body>
+"""
+_HTML_PAGE_OPEN = '    <div class="page" data-page-id="%s">\n'
+_HTML_FRAME = '''        <div class="frame" style="left: %spx; top: %spx; width: %spx; height: %spx; %s"
+             data-block-id="%s">
+            %s
+        </div>
+'''
+_HTML_PAGE_CLOSE = "    </div>\n"
+_HTML_TAIL = """</body>
+</html>"""
+
 
 class TypesettingEngine:
     """Core typesetting engine for Chinese text layout."""
@@ -21,6 +155,13 @@ class TypesettingEngine:
     def __init__(self):
         self.typography = ChineseTypography()
         self.fit_loop = FitLoop()
+        # (font-size, line-height, letter-spacing) CSS values -> parsed
+        # (font size px, line height, width ratio); the fit loop only steps
+        # through a handful of combinations, measured many times each
+        self._css_metrics: Dict[Tuple[str, str, str], Tuple[float, float, float]] = {}
+        # Fitted CSS by state values; frames with identical CSS share one read-only
+        # mapping, so the HTML generator formats each style string once
+        self._css_intern: Dict[Tuple[float, float, str, str], Mapping[str, str]] = {}
         
     async def typeset_pages(self, pages: List[Page], blocks: List[Block]) -> List[TypesetPage]:
         """
@@ -33,59 +174,63 @@ class TypesettingEngine:
         Returns:
             List of TypesetPage objects with positioned frames
         """
-        typeset_pages = []
+        # Group blocks by page in reading order with a single sort
+        blocks_by_page = {
+            page_id: list(page_blocks)
+            for page_id, page_blocks in itertools.groupby(
+                sorted(blocks, key=attrgetter("page_id", "order")),
+                key=attrgetter("page_id")
+            )
+        }
         
-        # Group blocks by page
-        blocks_by_page = {}
-        for block in blocks:
-            page_id = block.page_id
-            if page_id not in blocks_by_page:
-                blocks_by_page[page_id] = []
-            blocks_by_page[page_id].append(block)
+        # Pages and blocks are fitted independently, so process them
+        # concurrently; the semaphore bounds how many blocks are in flight
+        semaphore = asyncio.Semaphore(TYPESET_CONCURRENCY)
+        frames_by_page = await asyncio.gather(*(
+            self._typeset_page_blocks(page, blocks_by_page.get(page.id, []), semaphore)
+            for page in pages
+        ))
         
-        # Process each page
-        for page in pages:
-            page_blocks = blocks_by_page.get(page.id, [])
-            page_blocks.sort(key=lambda b: b.order)  # Sort by reading order
-            
-            frames = await self._typeset_page_blocks(page, page_blocks)
-            
-            typeset_page = TypesetPage(
+        return [
+            TypesetPage(
                 page_id=page.id,
                 width=page.width,
                 height=page.height,
                 frames=frames
             )
-            typeset_pages.append(typeset_page)
-        
-        return typeset_pages
+            for page, frames in zip(pages, frames_by_page)
+        ]
     
-    async def _typeset_page_blocks(self, page: Page, blocks: List[Block]) -> List[TypesetFrame]:
+    async def _typeset_page_blocks(
+        self,
+        page: Page,
+        blocks: List[Block],
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[TypesetFrame]:
         """Typeset all blocks on a single page."""
-        frames = []
+        semaphore = semaphore or asyncio.Semaphore(TYPESET_CONCURRENCY)
         
-        for block in blocks:
-            if not block.text_translated:
-                continue  # Skip untranslated blocks
-                
-            try:
-                frame = await self._typeset_block(page, block)
-                frames.append(frame)
-            except Exception as e:
-                logger.error(f"Error typesetting block {block.id}: {e}")
-                # Create fallback frame
-                frame = TypesetFrame(
-                    block_id=block.id,
-                    x=block.bbox_x,
-                    y=block.bbox_y,
-                    width=block.bbox_w,
-                    height=block.bbox_h,
-                    content=block.text_translated or block.text_source,
-                    css_properties=create_css_for_chinese_text()
-                )
-                frames.append(frame)
+        async def typeset(block: Block) -> TypesetFrame:
+            async with semaphore:
+                try:
+                    return await self._typeset_block(page, block)
+                except Exception as e:
+                    logger.error(f"Error typesetting block {block.id}: {e}")
+                    # Create fallback frame
+                    return TypesetFrame(
+                        block_id=block.id,
+                        x=block.bbox_x,
+                        y=block.bbox_y,
+                        width=block.bbox_w,
+                        height=block.bbox_h,
+                        content=block.text_translated or block.text_source,
+                        css_properties=self._get_default_css_for_block_type(block.type)
+                    )
         
-        return frames
+        # Skip untranslated blocks; gather keeps the reading order
+        return list(await asyncio.gather(
+            *(typeset(block) for block in blocks if block.text_translated)
+        ))
     
     async def _typeset_block(self, page: Page, block: Block) -> TypesetFrame:
         """
@@ -124,7 +269,8 @@ class TypesettingEngine:
                 )
                 
                 frame.content = fit_result.final_content
-                frame.css_properties = self._convert_css_to_dict(fit_result.css_properties)
+                # Only the first block with a given CSS state builds its dict
+                frame.css_properties = self._intern_css(fit_result.css_state)
                 
                 logger.debug(f"Block {block.id} fit result: {fit_result.fits}, iterations: {fit_result.iterations}")
                 
@@ -141,103 +287,69 @@ class TypesettingEngine:
     def _create_measure_function(self, page: Page):
         """Create a text measurement function for the given page context."""
         
-        async def measure_text(content: str, css_props: Dict[str, str]) -> Tuple[float, float]:
+        async def measure_text(content: str, css_props: Mapping[str, str]) -> Tuple[float, float]:
             """Measure text dimensions using estimated calculations."""
             
-            # Extract CSS properties
-            font_size = self._parse_font_size(css_props.get("font-size", "16px"))
-            line_height = float(css_props.get("line-height", "1.5"))
-            letter_spacing_em = float(css_props.get("letter-spacing", "0em").rstrip("em"))
+            # Extract CSS properties; fit-loop state already holds the floats
+            if isinstance(css_props, CssState):
+                font_size = self._parse_font_size(css_props.get("font-size", "16px"))
+                line_height = css_props.line_height
+                width_ratio = 1.0 + css_props.letter_spacing
+            else:
+                font_size, line_height, width_ratio = self._get_css_metrics(
+                    css_props.get("font-size", "16px"),
+                    css_props.get("line-height", "1.5"),
+                    css_props.get("letter-spacing", "0em")
+                )
             
             # Estimate dimensions using typography utilities
             estimated_width = self.typography.estimate_text_width(
-                content, font_size, 1.0 + letter_spacing_em
+                content, font_size, width_ratio
             )
             
-            # Estimate height based on line breaks
-            lines = content.split('\n')
-            if not lines:
-                return 0, 0
-            
-            line_count = len([line for line in lines if line.strip()])
+            # Estimate height based on non-blank lines; most blocks are a
+            # single line, which needs no split
+            if '\n' not in content:
+                line_count = 1 if content.strip() else 0
+            else:
+                line_count = len([line for line in content.split('\n') if line.strip()])
             estimated_height = line_count * font_size * line_height
             
             return estimated_width, estimated_height
         
         return measure_text
     
+    def _get_css_metrics(self, font_size: str, line_height: str, letter_spacing: str) -> Tuple[float, float, float]:
+        """Parse measurement CSS values once per distinct combination."""
+        key = (font_size, line_height, letter_spacing)
+        metrics = self._css_metrics.get(key)
+        if metrics is None:
+            if len(self._css_metrics) >= CSS_METRICS_CACHE_SIZE:
+                self._css_metrics.clear()
+            metrics = self._css_metrics[key] = (
+                self._parse_font_size(font_size),
+                float(line_height),
+                1.0 + float(letter_spacing.rstrip("em"))
+            )
+        return metrics
+    
     def _parse_font_size(self, font_size_str: str) -> float:
         """Parse font size string to pixels."""
-        if font_size_str.endswith("px"):
-            return float(font_size_str[:-2])
-        elif font_size_str.endswith("pt"):
-            return float(font_size_str[:-2]) * 1.333333  # Convert pt to px
-        elif font_size_str.endswith("em"):
-            return float(font_size_str[:-2]) * 16  # Assume 16px base
-        else:
-            return 16.0  # Default
+        return _parse_font_size(font_size_str)
     
-    def _convert_css_to_dict(self, css_props: Dict[str, str]) -> Dict[str, str]:
-        """Convert CSS properties to the format expected by frames."""
-        return css_props.copy()
+    def _intern_css(self, css: CssState) -> Mapping[str, str]:
+        """Return the shared read-only CSS mapping for a fitted CSS state."""
+        key = (css.line_height, css.letter_spacing, css.font_weight, css.font_stretch)
+        shared = self._css_intern.get(key)
+        if shared is None:
+            if len(self._css_intern) >= CSS_INTERN_CACHE_SIZE:
+                self._css_intern.clear()
+            shared = self._css_intern[key] = MappingProxyType(css.to_dict())
+        return shared
     
-    def _get_default_css_for_block_type(self, block_type: str) -> Dict[str, str]:
-        """Get default CSS properties for different block types."""
-        
-        base_css = {
-            "font-family": f'"{CHINESE_FONTS["serif"]}", serif',
-            "text-align": "justify",
-            "text-justify": "inter-ideograph",
-            "line-break": "strict",
-            "word-break": "keep-all",
-            "hyphens": "none",
-            "margin": "0",
-            "padding": "0"
-        }
-        
-        if block_type == "heading":
-            base_css.update({
-                "font-size": "20px",
-                "font-weight": "bold",
-                "line-height": "1.3",
-                "text-align": "center",
-                "margin-bottom": "16px"
-            })
-        elif block_type == "paragraph":
-            base_css.update({
-                "font-size": "16px",
-                "line-height": "1.6",
-                "text-indent": "2em",
-                "margin-bottom": "12px"
-            })
-        elif block_type == "caption":
-            base_css.update({
-                "font-size": "14px",
-                "line-height": "1.4",
-                "text-align": "center",
-                "font-style": "italic",
-                "color": "#666"
-            })
-        elif block_type == "footnote":
-            base_css.update({
-                "font-size": "12px",
-                "line-height": "1.3",
-                "text-indent": "1em",
-                "color": "#555"
-            })
-        elif block_type == "figure":
-            base_css.update({
-                "text-align": "center",
-                "margin": "16px 0"
-            })
-        elif block_type == "page-number":
-            base_css.update({
-                "font-size": "12px",
-                "text-align": "center",
-                "color": "#888"
-            })
-        
-        return base_css
+    def _get_default_css_for_block_type(self, block_type: str) -> Mapping[str, str]:
+        """Get default CSS properties for different block types (read-only, shared)."""
+        return _CSS_BY_BLOCK_TYPE.get(block_type, _BASE_CSS)
     
     def generate_html_for_pages(self, typeset_pages: List[TypesetPage]) -> str:
         """
@@ -249,84 +361,36 @@ class TypesettingEngine:
         Returns:
             Complete HTML document as string
         """
-        
-        html_template = Template("""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Typeset Document</title>
-    <style>
-        @font-face {
-            font-family: "Noto Serif CJK SC";
-            src: url("fonts/NotoSerifCJKsc-Regular.otf") format("opentype");
-            font-weight: normal;
-            font-style: normal;
-        }
-        
-        @font-face {
-            font-family: "Noto Sans CJK SC";  
-            src: url("fonts/NotoSansCJKsc-Regular.otf") format("opentype");
-            font-weight: normal;
-            font-style: normal;
-        }
-        
-        body {
-            margin: 0;
-            padding: 0;
-            font-family: "Noto Serif CJK SC", serif;
-            background-color: white;
-        }
-        
-        .page {
-            position: relative;
-            width: {{ page_width }}px;
-            height: {{ page_height }}px;
-            margin: 20px auto;
-            background: white;
-            box-shadow: 0 0 10px rgba(0,0,0,0.1);
-            page-break-after: always;
-        }
-        
-        .frame {
-            position: absolute;
-            overflow: hidden;
-        }
-        
-        @media print {
-            .page {
-                margin: 0;
-                box-shadow: none;
-                page-break-after: always;
-            }
-        }
-    </style>
-</head>
-<body>
-    {% for page in pages %}
-    <div class="page" data-page-id="{{ page.page_id }}">
-        {% for frame in page.frames %}
-        <div class="frame" style="left: {{ frame.x }}px; top: {{ frame.y }}px; width: {{ frame.width }}px; height: {{ frame.height }}px; {% for prop, value in frame.css_properties.items() %}{{ prop }}: {{ value }}; {% endfor %}"
-             data-block-id="{{ frame.block_id }}">
-            {{ frame.content | replace('\n', '<br>') | safe }}
-        </div>
-        {% endfor %}
-    </div>
-    {% endfor %}
-</body>
-</html>
-        """)
+        return "".join(self.iter_html_for_pages(typeset_pages))
+    
+    def iter_html_for_pages(self, typeset_pages: List[TypesetPage]) -> Iterator[str]:
+        """Yield the HTML document for the typeset pages in chunks."""
         
         # Calculate page dimensions (use first page as reference)
         page_width = typeset_pages[0].width if typeset_pages else 800
         page_height = typeset_pages[0].height if typeset_pages else 1100
         
-        return html_template.render(
-            pages=typeset_pages,
-            page_width=page_width,
-            page_height=page_height
-        )
+        yield _HTML_HEAD % {"page_width": page_width, "page_height": page_height}
+        
+        # Frames of the same block type share one CSS mapping, so each
+        # distinct mapping is formatted once; ids are stable while pages live
+        styles: Dict[int, str] = {}
+        
+        for page in typeset_pages:
+            yield _HTML_PAGE_OPEN % page.page_id
+            for frame in page.frames:
+                style = styles.get(id(frame.css_properties))
+                if style is None:
+                    style = styles[id(frame.css_properties)] = "".join(
+                        f"{prop}: {value}; " for prop, value in frame.css_properties.items()
+                    )
+                yield _HTML_FRAME % (
+                    frame.x, frame.y, frame.width, frame.height, style,
+                    frame.block_id, sanitize_inline_markup(frame.content, "<br>")
+                )
+            yield _HTML_PAGE_CLOSE
+        
+        yield _HTML_TAIL
     
     async def render_html_to_pdf(self, html_content: str, output_path: Path) -> bool:
         """
@@ -339,43 +403,65 @@ class TypesettingEngine:
         Returns:
             True if successful, False otherwise
         """
+        if HTML is None:
+            logger.error("Error rendering PDF: weasyprint is not installed")
+            return False
+        
         try:
-            # Create temporary HTML file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as tmp_file:
-                tmp_file.write(html_content)
-                tmp_html_path = tmp_file.name
-            
-            # Use WeasyPrint command line tool
-            cmd = [
-                'weasyprint',
-                '--format', 'pdf',
-                '--encoding', 'utf-8',
-                tmp_html_path,
-                str(output_path)
-            ]
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0:
-                logger.info(f"PDF generated successfully: {output_path}")
-                return True
-            else:
-                logger.error(f"WeasyPrint failed: {stderr.decode()}")
-                return False
+            # Rendering is in-process (no CLI startup or temp file) but
+            # CPU-bound, so keep it off the event loop
+            await asyncio.to_thread(_write_pdf, html_content, output_path)
+            logger.info(f"PDF generated successfully: {output_path}")
+            return True
         
         except Exception as e:
             logger.error(f"Error rendering PDF: {e}")
             return False
-        
-        finally:
-            # Clean up temporary file
-            try:
-                Path(tmp_html_path).unlink()
-            except:
-                pass
\ No newline at end of file
+
+
+@lru_cache(maxsize=None)
+def _font_config() -> "FontConfiguration":
+    """Font configuration shared by all renders; setting it up is costly."""
+    return FontConfiguration()
+
+
+def preload_pdf_renderer() -> None:
+    """
+    Set up WeasyPrint font configuration ahead of the first render.
+    
+    Workers call this before forking job processes so every job inherits a
+    ready renderer instead of rebuilding the font configuration.
+    """
+    if HTML is not None:
+        _font_config()
+
+
+def _write_pdf(html_content: str, output_path: Path) -> None:
+    """Render HTML to a PDF file; font URLs resolve relative to the fonts directory's parent."""
+    HTML(string=html_content, base_url=str(FONTS_DIR.parent)).write_pdf(
+        str(output_path), font_config=_font_config()
+    )
+
+
+@lru_cache(maxsize=None)
+def get_typesetting_engine() -> TypesettingEngine:
+    """Get the process-wide typesetting engine; it holds no per-book state."""
+    return TypesettingEngine()
+
+
+# Pixels per unit for the font-size units the layout understands
+_FONT_SIZE_UNITS = {
+    "px": 1.0,
+    "pt": 1.333333,  # Convert pt to px
+    "em": 16.0,  # Assume 16px base
+}
+_FONT_SIZE_RE = re.compile(r'(.*)(px|pt|em)', re.DOTALL)
+
+
+@lru_cache(maxsize=128)
+def _parse_font_size(font_size_str: str) -> float:
+    """Parse font size string to pixels; only a few distinct sizes occur."""
+    match = _FONT_SIZE_RE.fullmatch(font_size_str)
+    if not match:
+        return 16.0  # Default
+    return float(match.group(1)) * _FONT_SIZE_UNITS[match.group(2)]
@@ -0,0 +1,10 @@
+-- Composite indexes matching the book/page ordering used by the API and workers
+
+-- Pages of a book in page order
+CREATE INDEX IF NOT EXISTS ix_pages_book_index ON pages(book_id, index);
+
+-- Blocks of a page in reading order
+CREATE INDEX IF NOT EXISTS ix_blocks_page_order ON blocks(page_id, "order");
+
+-- Blocks still waiting for translation
+CREATE INDEX IF NOT EXISTS ix_blocks_untranslated ON blocks(page_id) WHERE text_translated IS NULL;
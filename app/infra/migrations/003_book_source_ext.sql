@@ -0,0 +1,3 @@
+-- Record the uploaded source file's extension so workers can open it directly
+
+ALTER TABLE books ADD COLUMN IF NOT EXISTS source_ext VARCHAR(8);
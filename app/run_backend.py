@@ -2,13 +2,10 @@
 """
 GPTrans Backend Server
 """
-import sys
-from pathlib import Path
-
-# Add parent directory to Python path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
 if __name__ == "__main__":
+    from pathlib import Path
+    
     import uvicorn
     from app.backend.main import app
     
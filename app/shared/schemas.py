@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Mapping, Union
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 
@@ -223,17 +224,23 @@ class FitLoopConfig(BaseModel):
     concise_threshold: float = 0.9  # trigger concise translation at 90%
 
 
-class TypesetFrame(BaseModel):
+# Typeset output is internal to typesetting/export and built once per block,
+# so it uses slotted dataclasses instead of validated models
+
+
+@dataclass(slots=True)
+class TypesetFrame:
     block_id: int
     x: float
     y: float
     width: float
     height: float
     content: str
-    css_properties: Dict[str, str] = {}
+    css_properties: Mapping[str, str] = field(default_factory=dict)
 
 
-class TypesetPage(BaseModel):
+@dataclass(slots=True)
+class TypesetPage:
     page_id: int
     width: float
     height: float
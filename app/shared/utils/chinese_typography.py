@@ -1,9 +1,61 @@
 import re
 import unicodedata
+from functools import lru_cache
 from typing import List, Tuple
 # from icu import BreakIterator, Locale  # Optional: requires PyICU
 from app.shared.constants import NO_LINE_START_CHARS, NO_LINE_END_CHARS
 
+# CJK (Chinese, Japanese, Korean) code point ranges, as a regex class body
+_CJK_RANGES = (
+    '\u4e00-\u9fff'           # CJK Unified Ideographs
+    '\u3400-\u4dbf'           # CJK Extension A
+    '\U00020000-\U0002a6df'   # CJK Extension B
+    '\U0002a700-\U0002b73f'   # CJK Extension C
+    '\U0002b740-\U0002b81f'   # CJK Extension D
+    '\U0002b820-\U0002ceaf'   # CJK Extension E
+    '\u3040-\u309f'           # Hiragana
+    '\u30a0-\u30ff'           # Katakana
+)
+_CJK_CHAR_RE = re.compile(f'[{_CJK_RANGES}]')
+
+# Whitespace and CJK characters, where a line may break
+_BREAK_OPPORTUNITY_RE = re.compile(f'[ \t\n{_CJK_RANGES}]')
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Inline markup: <tag>...</tag>, <tag/> or {FN:n} and similar placeholders
+_MARKUP_RE = re.compile(r'(<[^>]+>.*?</[^>]+>|<[^/>]+/>|\{[^}]+\})')
+
+# NBSP before characters that must not start a line and after characters
+# that must not end one; characters in both sets get one on each side
+_LINE_BREAK_TABLE = str.maketrans({
+    **{char: f'\u00A0{char}' for char in NO_LINE_START_CHARS},
+    **{
+        char: f'\u00A0{char}\u00A0' if char in NO_LINE_START_CHARS else f'{char}\u00A0'
+        for char in NO_LINE_END_CHARS
+    },
+})
+
+
+@lru_cache(maxsize=4096)
+def _count_characters(text: str) -> Tuple[int, int, int]:
+    """
+    Count total, CJK and ASCII characters of text.
+    
+    The fit loop measures the same content repeatedly while only font size
+    and spacing change, so the counts (the only text-dependent part of a
+    width estimate) are memoized per string.
+    """
+    # Both counts run in C: the regex strips CJK characters in one pass
+    # and the ASCII codec drops everything else
+    total = len(text)
+    if text.isascii():
+        return total, 0, total
+    cjk = total - len(_CJK_CHAR_RE.sub('', text))
+    ascii_count = len(text.encode('ascii', 'ignore'))
+    return total, cjk, ascii_count
+
 
 class ChineseTypography:
     """Chinese typography utilities for proper line breaking and punctuation handling."""
@@ -15,57 +67,38 @@ class ChineseTypography:
         
     def apply_line_break_rules(self, text: str) -> str:
         """Apply Chinese line breaking rules with proper punctuation handling."""
-        if not text.strip():
+        # Remove existing hard line breaks and collapse whitespace; split()
+        # strips and splits on the same whitespace as \s in one C-level scan
+        words = text.split()
+        if not words:
             return text
-            
-        # Remove existing hard line breaks
-        text = re.sub(r'\n+', ' ', text)
-        text = re.sub(r'\s+', ' ', text.strip())
         
-        # Insert zero-width non-breaking space around punctuation to control breaks
-        # Prevent line breaks before certain punctuation
-        for char in NO_LINE_START_CHARS:
-            text = text.replace(char, f'\u00A0{char}')  # NBSP before
-            
-        # Prevent line breaks after certain punctuation
-        for char in NO_LINE_END_CHARS:
-            text = text.replace(char, f'{char}\u00A0')  # NBSP after
-            
-        return text
+        # Insert non-breaking spaces around punctuation to control breaks,
+        # all characters in a single pass
+        return ' '.join(words).translate(_LINE_BREAK_TABLE)
     
     def get_line_break_opportunities(self, text: str) -> List[int]:
         """Get valid line break positions (simplified implementation without ICU)."""
         # Simple implementation - break on word boundaries
-        breaks = []
-        for i, char in enumerate(text):
-            if char in ' \t\n' or self.is_cjk_character(char):
-                breaks.append(i)
-        return breaks
+        return [match.start() for match in _BREAK_OPPORTUNITY_RE.finditer(text)]
     
     def is_cjk_character(self, char: str) -> bool:
         """Check if character is CJK (Chinese, Japanese, Korean)."""
         if not char:
             return False
-        return any(start <= ord(char) <= end for start, end in [
-            (0x4E00, 0x9FFF),    # CJK Unified Ideographs
-            (0x3400, 0x4DBF),    # CJK Extension A
-            (0x20000, 0x2A6DF),  # CJK Extension B
-            (0x2A700, 0x2B73F),  # CJK Extension C
-            (0x2B740, 0x2B81F),  # CJK Extension D
-            (0x2B820, 0x2CEAF),  # CJK Extension E
-            (0x3040, 0x309F),    # Hiragana
-            (0x30A0, 0x30FF),    # Katakana
-        ])
+        return _CJK_CHAR_RE.match(char) is not None
     
     def count_characters(self, text: str) -> Tuple[int, int, int]:
         """Count total characters, CJK characters, and ASCII characters."""
-        total = len(text)
-        cjk = sum(1 for char in text if self.is_cjk_character(char))
-        ascii_count = sum(1 for char in text if ord(char) < 128)
-        return total, cjk, ascii_count
+        return _count_characters(text)
     
     def estimate_text_width(self, text: str, font_size: float = 16, cjk_width_ratio: float = 1.0) -> float:
         """Estimate text width in pixels for layout calculations."""
+        # Labels and page numbers are often pure ASCII; isascii() is a C-level
+        # scan that skips counting entirely
+        if text.isascii():
+            return len(text) * font_size * 0.55
+        
         total, cjk, ascii_count = self.count_characters(text)
         
         # CJK characters are typically square (1em width)
@@ -78,10 +111,7 @@ class ChineseTypography:
     
     def split_preserve_markup(self, text: str) -> List[str]:
         """Split text while preserving inline markup like <i>, {FN:1}, etc."""
-        # Pattern to match markup: <tag>...</tag> or {FN:n} or similar
-        markup_pattern = r'(<[^>]+>.*?</[^>]+>|<[^/>]+/>|\{[^}]+\})'
-        
-        parts = re.split(markup_pattern, text)
+        parts = _MARKUP_RE.split(text)
         return [part for part in parts if part.strip()]
     
     def clean_for_export(self, text: str) -> str:
@@ -90,7 +120,7 @@ class ChineseTypography:
         text = text.replace('\u00A0', ' ')
         
         # Normalize whitespace
-        text = re.sub(r'\s+', ' ', text.strip())
+        text = _WHITESPACE_RE.sub(' ', text.strip())
         
         return text
     
@@ -115,6 +145,7 @@ class ChineseTypography:
         return '\n'.join(line for line in lines if line.strip())
 
 
+@lru_cache(maxsize=None)
 def create_css_for_chinese_text(
     font_family: str = "Noto Serif CJK SC",
     font_size: str = "16px",
@@ -141,4 +172,55 @@ def create_css_for_chinese_text(
         "padding": "0",
     }
     
-    return "; ".join(f"{prop}: {value}" for prop, value in css_props.items())
\ No newline at end of file
+    return "; ".join(f"{prop}: {value}" for prop, value in css_props.items())
+
+
+# Inline tags translations may carry into the exports; any other tag-like
+# text is escaped and shown as written
+_INLINE_TAGS = frozenset({"b", "i", "em", "strong", "u", "sub", "sup", "small"})
+_INLINE_TAG_RE = re.compile(r'<(/?)([a-zA-Z]+)\s*(/?)>')
+_TEXT_ESCAPE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def sanitize_inline_markup(text: str, line_break: str = "<br/>") -> str:
+    """
+    Render frame text as (X)HTML for the PDF and ePub exporters.
+    
+    Text, including stray '<', '>' and '&', is escaped; only bare
+    allowlisted inline tags (<i>, <b>, ...) and <br> pass through, kept
+    balanced so the XHTML stays well-formed. Line breaks become line_break.
+    Placeholders like {FN:1} are plain text and need no escaping.
+    """
+    if "<" not in text and ">" not in text and "&" not in text:
+        return text.replace("\n", line_break)
+    
+    parts = []
+    open_tags: List[str] = []
+    pos = 0
+    for match in _INLINE_TAG_RE.finditer(text):
+        closing, name, self_closing = match.groups()
+        name = name.lower()
+        if name == "br" and not closing:
+            tag = line_break
+        elif name not in _INLINE_TAGS or self_closing:
+            continue  # not markup we keep; escaped with the text around it
+        elif not closing:
+            open_tags.append(name)
+            tag = f"<{name}>"
+        elif name in open_tags:
+            # Close any tags opened inside this one so nesting stays valid
+            tag = ""
+            while True:
+                top = open_tags.pop()
+                tag += f"</{top}>"
+                if top == name:
+                    break
+        else:
+            tag = ""  # closes nothing; dropped
+        parts.append(text[pos:match.start()].translate(_TEXT_ESCAPE_TABLE).replace("\n", line_break))
+        parts.append(tag)
+        pos = match.end()
+    
+    parts.append(text[pos:].translate(_TEXT_ESCAPE_TABLE).replace("\n", line_break))
+    parts.extend(f"</{name}>" for name in reversed(open_tags))
+    return "".join(parts)
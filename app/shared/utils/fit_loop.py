@@ -1,21 +1,79 @@
 import asyncio
 import logging
-from typing import Dict, Any, Optional, Tuple, Callable
-from dataclasses import dataclass
+import math
+from collections.abc import Mapping
+from typing import Dict, Any, Iterator, Optional, Tuple, Callable
+from dataclasses import dataclass, replace
+from functools import lru_cache
 from app.shared.schemas import FitLoopConfig, TypesetFrame
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+_CSS_STATE_PROPERTIES = ("line-height", "letter-spacing", "font-weight", "font-stretch")
+
+
+# The fit loop only visits a small grid of values, so their CSS strings are
+# formatted once; typed keeps 1 and 1.0 apart as str() does
+@lru_cache(maxsize=256, typed=True)
+def _fmt_num(value: float) -> str:
+    return str(value)
+
+
+@lru_cache(maxsize=256, typed=True)
+def _fmt_em(value: float) -> str:
+    return f"{value}em"
+
+
+@dataclass(slots=True)
+class CssState(Mapping):
+    """
+    CSS adjusted by the fit loop, with numeric values kept as floats.
+    
+    It also reads as a mapping of CSS property strings, so measure functions
+    written against plain CSS dicts keep working unchanged.
+    """
+    line_height: float
+    letter_spacing: float  # em
+    font_weight: str = "normal"
+    font_stretch: str = "normal"
+    
+    def __getitem__(self, prop: str) -> str:
+        if prop == "line-height":
+            return _fmt_num(self.line_height)
+        if prop == "letter-spacing":
+            return _fmt_em(self.letter_spacing)
+        if prop == "font-weight":
+            return self.font_weight
+        if prop == "font-stretch":
+            return self.font_stretch
+        raise KeyError(prop)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(_CSS_STATE_PROPERTIES)
+    
+    def __len__(self) -> int:
+        return len(_CSS_STATE_PROPERTIES)
+    
+    def to_dict(self) -> Dict[str, str]:
+        """Serialize to CSS property strings."""
+        return {prop: self[prop] for prop in _CSS_STATE_PROPERTIES}
+
+
+@dataclass(slots=True, frozen=True)
 class FitResult:
     """Result of a fit loop iteration."""
     fits: bool
     overflow_ratio: float
     density_ratio: float
-    css_properties: Dict[str, str]
+    css_state: CssState
     iterations: int
     final_content: str
+    
+    @property
+    def css_properties(self) -> Dict[str, str]:
+        """Fitted CSS as property strings, built on each access."""
+        return self.css_state.to_dict()
 
 
 class FitLoop:
@@ -23,12 +81,23 @@ class FitLoop:
     
     def __init__(self, config: FitLoopConfig = None):
         self.config = config or FitLoopConfig()
+        # Adjustment applied at each iteration, indexed by iteration number
+        self._compress_steps = (
+            self._reduce_letter_spacing,
+            self._reduce_line_height,
+            self._set_condensed,
+            self._set_light_weight
+        )
+        self._expand_steps = (
+            self._increase_line_height,
+            self._increase_letter_spacing
+        )
         
     async def fit_text_to_frame(
         self,
         frame: TypesetFrame,
         content: str,
-        measure_func: Callable[[str, Dict[str, str]], Tuple[float, float]],
+        measure_func: Callable[[str, Mapping[str, str]], Tuple[float, float]],
         translate_concise_func: Optional[Callable[[str], str]] = None
     ) -> FitResult:
         """
@@ -47,42 +116,71 @@ class FitLoop:
         current_content = content
         
         # Initialize CSS properties
-        css_props = {
-            "line-height": str(self.config.initial_line_height),
-            "letter-spacing": f"{self.config.initial_letter_spacing}em",
-            "font-weight": "normal",
-            "font-stretch": "normal"
-        }
+        css = self._initial_css()
+        
+        # Loop invariants, bound once rather than looked up per iteration
+        max_overflow = 1.0 + self.config.overflow_tolerance
+        frame_width = frame.width
+        frame_height = frame.height
+        expand_steps = self._expand_steps
+        
+        # Content and CSS of the most recent measurement, so the final
+        # re-measurement can be skipped when nothing changed since
+        measured_state = None
+        
+        # Overflow is first handled by solving for the spacing directly; the
+        # stepwise compressions below only run if that still doesn't fit
+        spacing_solved = False
+        steps_tried = False
         
         for iteration in range(10):  # FIT_LOOP_MAX_ITERATIONS
-            # Measure current text
-            text_width, text_height = await measure_func(current_content, css_props)
+            # Measure current text, unless already measured while compressing
+            if measured_state != (current_content, css):
+                text_width, text_height = await measure_func(current_content, css)
+                measured_state = (current_content, replace(css))
             
             # Calculate ratios
-            overflow_ratio = text_height / frame.height if frame.height > 0 else 0
-            density_ratio = text_width / frame.width if frame.width > 0 else 0
+            overflow_ratio = text_height / frame_height if frame_height > 0 else 0
+            density_ratio = text_width / frame_width if frame_width > 0 else 0
             
             logger.debug(f"Iteration {iteration}: overflow={overflow_ratio:.3f}, density={density_ratio:.3f}")
             
             # Check if we fit within tolerance
-            if overflow_ratio <= (1.0 + self.config.overflow_tolerance):
+            if overflow_ratio <= max_overflow:
                 # Check if density is reasonable (not too sparse)
                 if density_ratio >= 0.4:  # Minimum density threshold
                     return FitResult(
                         fits=True,
                         overflow_ratio=overflow_ratio,
                         density_ratio=density_ratio,
-                        css_properties=css_props,
+                        css_state=css,
                         iterations=iteration + 1,
                         final_content=current_content
                     )
                 else:
-                    # Text is too sparse, try to expand it
-                    css_props = await self._expand_text(css_props, iteration)
+                    # Text is too sparse, try to expand it; once expansion no
+                    # longer changes anything, later iterations would only
+                    # repeat this one
+                    if iteration < len(expand_steps):
+                        expand_steps[iteration](css)
+                    if measured_state == (current_content, css):
+                        break
                     continue
             
             # Text doesn't fit, try to compress it
-            success = await self._compress_text(css_props, iteration)
+            success = False
+            if not spacing_solved:
+                spacing_solved = True
+                success = self._solve_spacing(css, overflow_ratio)
+            if not success and not steps_tried:
+                steps_tried = True
+                compressed = await self._compress_speculatively(
+                    frame, current_content, css, measure_func
+                )
+                if compressed is not None:
+                    css, text_width, text_height = compressed
+                    measured_state = (current_content, replace(css))
+                    success = True
             if not success:
                 # Compression failed, try concise translation
                 if translate_concise_func and iteration < 3:  # Only try concise early
@@ -92,12 +190,9 @@ class FitLoop:
                         if len(concise_content) < len(current_content):
                             current_content = concise_content
                             # Reset CSS to defaults for new content
-                            css_props = {
-                                "line-height": str(self.config.initial_line_height),
-                                "letter-spacing": f"{self.config.initial_letter_spacing}em",
-                                "font-weight": "normal",
-                                "font-stretch": "normal"
-                            }
+                            self._reset_css(css)
+                            spacing_solved = False
+                            steps_tried = False
                             continue
                     except Exception as e:
                         logger.warning(f"Concise translation failed: {e}")
@@ -106,71 +201,191 @@ class FitLoop:
                 logger.warning(f"Could not fit text after {iteration + 1} iterations, allowing overflow")
                 break
         
-        # Final measurement
-        text_width, text_height = await measure_func(current_content, css_props)
-        overflow_ratio = text_height / frame.height if frame.height > 0 else 0
-        density_ratio = text_width / frame.width if frame.width > 0 else 0
+        # Final measurement, reusing the last one if content and CSS are unchanged
+        if measured_state != (current_content, css):
+            text_width, text_height = await measure_func(current_content, css)
+        overflow_ratio = text_height / frame_height if frame_height > 0 else 0
+        density_ratio = text_width / frame_width if frame_width > 0 else 0
         
         return FitResult(
             fits=overflow_ratio <= 1.1,  # Allow 10% overflow as final fallback
             overflow_ratio=overflow_ratio,
             density_ratio=density_ratio,
-            css_properties=css_props,
+            css_state=css,
             iterations=10,  # FIT_LOOP_MAX_ITERATIONS
             final_content=current_content
         )
     
-    async def _compress_text(self, css_props: Dict[str, str], iteration: int) -> bool:
-        """Apply compression techniques progressively."""
+    async def _compress_speculatively(
+        self,
+        frame: TypesetFrame,
+        content: str,
+        css: CssState,
+        measure_func: Callable[[str, Mapping[str, str]], Tuple[float, float]]
+    ) -> Optional[Tuple[CssState, float, float]]:
+        """
+        Measure every remaining compression step at once.
         
-        if iteration == 0:
-            # Step 1: Reduce letter spacing
-            current_spacing = float(css_props["letter-spacing"].rstrip("em"))
-            if current_spacing > self.config.min_letter_spacing:
-                new_spacing = max(self.config.min_letter_spacing, current_spacing - 0.01)
-                css_props["letter-spacing"] = f"{new_spacing}em"
-                return True
-        
-        elif iteration == 1:
-            # Step 2: Reduce line height
-            current_height = float(css_props["line-height"])
-            if current_height > self.config.min_line_height:
-                new_height = max(self.config.min_line_height, current_height - 0.05)
-                css_props["line-height"] = str(new_height)
-                return True
-        
-        elif iteration == 2:
-            # Step 3: Use condensed font if available
-            if css_props.get("font-stretch", "normal") == "normal":
-                css_props["font-stretch"] = "condensed"
-                return True
-        
-        elif iteration == 3:
-            # Step 4: Use lighter font weight
-            if css_props.get("font-weight", "normal") == "normal":
-                css_props["font-weight"] = "300"
-                return True
+        Each candidate applies the steps cumulatively, as the loop would one
+        iteration at a time, but the measurements run concurrently so a slow
+        measure_func costs one round trip instead of one per step. The least
+        compressed candidate that fits is chosen, or the most compressed one
+        if none do. Returns None if no step changes anything.
+        """
+        candidates = []
+        candidate = css
+        for step in self._compress_steps:
+            candidate = replace(candidate)
+            if step(candidate):
+                candidates.append(candidate)
+        if not candidates:
+            return None
         
-        return False
+        measurements = await asyncio.gather(
+            *(measure_func(content, candidate) for candidate in candidates)
+        )
+        frame_height = frame.height
+        max_overflow = 1.0 + self.config.overflow_tolerance
+        for candidate, (width, height) in zip(candidates, measurements):
+            overflow_ratio = height / frame_height if frame_height > 0 else 0
+            if overflow_ratio <= max_overflow:
+                return candidate, width, height
+        return (candidates[-1], *measurements[-1])
     
-    async def _expand_text(self, css_props: Dict[str, str], iteration: int) -> Dict[str, str]:
-        """Apply expansion techniques for sparse text."""
-        
-        if iteration == 0:
-            # Step A: Increase line height
-            current_height = float(css_props["line-height"])
-            if current_height < self.config.max_line_height:
-                new_height = min(self.config.max_line_height, current_height + 0.1)
-                css_props["line-height"] = str(new_height)
+    def _initial_css(self) -> CssState:
+        """CSS state the loop starts from."""
+        return CssState(
+            line_height=self.config.initial_line_height,
+            letter_spacing=self.config.initial_letter_spacing
+        )
+    
+    def _reset_css(self, css: CssState) -> None:
+        """Return CSS state to its initial values in place after a concise rewrite."""
+        css.line_height = self.config.initial_line_height
+        css.letter_spacing = self.config.initial_letter_spacing
+        css.font_weight = "normal"
+        css.font_stretch = "normal"
+    
+    def _solve_spacing(self, css: CssState, overflow_ratio: float) -> bool:
+        """
+        Set the spacing expected to fit in one step, since height scales
+        linearly with line-height.
         
-        elif iteration == 1:
-            # Step B: Increase letter spacing
-            current_spacing = float(css_props["letter-spacing"].rstrip("em"))
-            if current_spacing < self.config.max_letter_spacing:
-                new_spacing = min(self.config.max_letter_spacing, current_spacing + 0.005)
-                css_props["letter-spacing"] = f"{new_spacing}em"
+        Line-height takes as much of the reduction as its minimum allows; any
+        remainder goes to letter-spacing, which only shortens text by
+        rewrapping it. Values are rounded down to 1/1000 so they stay within
+        the target.
+        """
+        scale = 1.0 / overflow_ratio
+        line_height = max(self.config.min_line_height, _round_down(css.line_height * scale))
+        remainder = css.line_height * scale / line_height
+        letter_spacing = css.letter_spacing
+        if remainder < 1.0:
+            letter_spacing = max(
+                self.config.min_letter_spacing,
+                min(letter_spacing, _round_down((1.0 + letter_spacing) * remainder - 1.0))
+            )
         
-        return css_props
+        if line_height >= css.line_height and letter_spacing >= css.letter_spacing:
+            return False
+        css.line_height = min(css.line_height, line_height)
+        css.letter_spacing = letter_spacing
+        return True
+    
+    def _compress_text(self, css: CssState, step: int) -> bool:
+        """Apply compression techniques progressively."""
+        if step < len(self._compress_steps):
+            return self._compress_steps[step](css)
+        return False
+    
+    def _expand_text(self, css: CssState, step: int) -> CssState:
+        """Apply expansion techniques for sparse text."""
+        if step < len(self._expand_steps):
+            self._expand_steps[step](css)
+        return css
+    
+    def _reduce_letter_spacing(self, css: CssState) -> bool:
+        """Compression step 1: reduce letter spacing."""
+        min_letter_spacing = self.config.min_letter_spacing
+        if css.letter_spacing > min_letter_spacing:
+            css.letter_spacing = max(min_letter_spacing, css.letter_spacing - 0.01)
+            return True
+        return False
+    
+    def _reduce_line_height(self, css: CssState) -> bool:
+        """Compression step 2: reduce line height."""
+        min_line_height = self.config.min_line_height
+        if css.line_height > min_line_height:
+            css.line_height = max(min_line_height, css.line_height - 0.05)
+            return True
+        return False
+    
+    def _set_condensed(self, css: CssState) -> bool:
+        """Compression step 3: use condensed font if available."""
+        if css.font_stretch == "normal":
+            css.font_stretch = "condensed"
+            return True
+        return False
+    
+    def _set_light_weight(self, css: CssState) -> bool:
+        """Compression step 4: use lighter font weight."""
+        if css.font_weight == "normal":
+            css.font_weight = "300"
+            return True
+        return False
+    
+    def _increase_line_height(self, css: CssState) -> bool:
+        """Expansion step A: increase line height."""
+        max_line_height = self.config.max_line_height
+        if css.line_height < max_line_height:
+            css.line_height = min(max_line_height, css.line_height + 0.1)
+            return True
+        return False
+    
+    def _increase_letter_spacing(self, css: CssState) -> bool:
+        """Expansion step B: increase letter spacing."""
+        max_letter_spacing = self.config.max_letter_spacing
+        if css.letter_spacing < max_letter_spacing:
+            css.letter_spacing = min(max_letter_spacing, css.letter_spacing + 0.005)
+            return True
+        return False
+
+
+def _round_down(value: float, places: int = 3) -> float:
+    """Round down to the given decimal places, keeping CSS values short."""
+    factor = 10 ** places
+    return math.floor(value * factor) / factor
+
+
+@lru_cache(maxsize=64)
+def _line_stats(content: str) -> Tuple[int, int]:
+    """Longest line length and line count; content only changes on concise rewrites."""
+    if '\n' not in content:
+        return len(content), 1
+    lines = content.split('\n')
+    return max(map(len, lines)), len(lines)
+
+
+# Set to make MockMeasureFunc sleep like a real layout round trip
+_SIMULATE_LATENCY = False
+
+# Width multiplier per font-stretch value in the mock measurement
+_FONT_STRETCH_FACTORS = {"condensed": 0.85}
+
+
+def _compute_dims(
+    max_line_length: int,
+    line_count: int,
+    char_width: float,
+    char_height: float,
+    line_height: float,
+    letter_spacing_em: float,
+    stretch_factor: float
+) -> Tuple[float, float]:
+    """Width and height of a text block from its line stats and CSS values."""
+    width = max_line_length * char_width * (1 + letter_spacing_em) * stretch_factor
+    height = line_count * char_height * line_height
+    return width, height
 
 
 class MockMeasureFunc:
@@ -179,27 +394,37 @@ class MockMeasureFunc:
     def __init__(self, char_width: float = 16, char_height: float = 24):
         self.char_width = char_width
         self.char_height = char_height
+        # (content, line height, letter spacing, font stretch) -> (width, height)
+        self._cache: Dict[Tuple[str, float, float, str], Tuple[float, float]] = {}
     
-    async def __call__(self, content: str, css_props: Dict[str, str]) -> Tuple[float, float]:
+    async def __call__(self, content: str, css_props: Mapping[str, str]) -> Tuple[float, float]:
         """Estimate text dimensions based on character count."""
-        await asyncio.sleep(0.001)  # Simulate async measurement
+        # Apply CSS property effects; fit-loop state needs no string parsing
+        if isinstance(css_props, CssState):
+            line_height = css_props.line_height
+            letter_spacing_em = css_props.letter_spacing
+            font_stretch = css_props.font_stretch
+        else:
+            line_height = float(css_props.get("line-height", "1.5"))
+            letter_spacing_em = float(css_props.get("letter-spacing", "0").rstrip("em"))
+            font_stretch = css_props.get("font-stretch", "normal")
         
-        lines = content.split('\n')
-        max_line_length = max(len(line) for line in lines) if lines else 0
+        key = (content, line_height, letter_spacing_em, font_stretch)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
         
-        # Apply CSS property effects
-        line_height = float(css_props.get("line-height", "1.5"))
-        letter_spacing_em = float(css_props.get("letter-spacing", "0").rstrip("em"))
+        if _SIMULATE_LATENCY:
+            await asyncio.sleep(0.001)  # Simulate async measurement
         
-        # Calculate dimensions
-        width = max_line_length * self.char_width * (1 + letter_spacing_em)
-        height = len(lines) * self.char_height * line_height
-        
-        # Apply font-stretch effects
-        if css_props.get("font-stretch") == "condensed":
-            width *= 0.85
-        
-        return width, height
+        max_line_length, line_count = _line_stats(content)
+        dims = self._cache[key] = _compute_dims(
+            max_line_length, line_count,
+            self.char_width, self.char_height,
+            line_height, letter_spacing_em,
+            _FONT_STRETCH_FACTORS.get(font_stretch, 1.0)
+        )
+        return dims
 
 
 # Example usage and testing functions
@@ -1,7 +1,4 @@
 import pytest
-import sys
-from pathlib import Path
-sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from app.shared.utils.chinese_typography import ChineseTypography, create_css_for_chinese_text
 
@@ -1,12 +1,8 @@
 import pytest
 import asyncio
-import sys
-from pathlib import Path
 from unittest.mock import Mock, AsyncMock
 
-sys.path.append(str(Path(__file__).parent.parent.parent))
-
-from app.shared.utils.fit_loop import FitLoop, FitResult, MockMeasureFunc
+from app.shared.utils.fit_loop import CssState, FitLoop, FitResult, MockMeasureFunc
 from app.shared.schemas import FitLoopConfig, TypesetFrame
 
 
@@ -73,6 +69,24 @@ class TestFitLoop:
         assert float(result.css_properties["line-height"]) <= fit_loop.config.initial_line_height
         assert result.overflow_ratio > 0
     
+    @pytest.mark.asyncio
+    async def test_fit_loop_solves_line_height(self, fit_loop, test_frame, mock_measure_func):
+        """Test that overflow is fixed with a single re-measurement."""
+        
+        # 3 lines at line-height 1.5 are 108px tall in a 100px frame
+        content = "\n".join(["测试内容测试"] * 3)
+        
+        result = await fit_loop.fit_text_to_frame(
+            frame=test_frame,
+            content=content,
+            measure_func=mock_measure_func
+        )
+        
+        assert result.fits is True
+        assert result.iterations == 2
+        assert result.css_properties["line-height"] == "1.4"
+        assert result.css_properties["font-stretch"] == "normal"
+    
     @pytest.mark.asyncio
     async def test_fit_loop_with_concise_translation(self, fit_loop, test_frame, mock_measure_func):
         """Test fit loop with concise translation fallback."""
@@ -93,47 +107,37 @@ class TestFitLoop:
         # Should have tried concise translation
         assert len(result.final_content) <= len(long_content)
     
-    @pytest.mark.asyncio
-    async def test_css_compression_steps(self, fit_loop):
+    def test_css_compression_steps(self, fit_loop):
         """Test individual CSS compression steps."""
         
-        css_props = {
-            "line-height": "1.5",
-            "letter-spacing": "0em",
-            "font-weight": "normal",
-            "font-stretch": "normal"
-        }
+        css_props = CssState(line_height=1.5, letter_spacing=0.0)
         
         # Test letter spacing compression
-        success = await fit_loop._compress_text(css_props, 0)
+        success = fit_loop._compress_text(css_props, 0)
         assert success is True
         assert float(css_props["letter-spacing"].rstrip("em")) < 0
         
         # Test line height compression
-        success = await fit_loop._compress_text(css_props, 1)
+        success = fit_loop._compress_text(css_props, 1)
         assert success is True
         assert float(css_props["line-height"]) < 1.5
         
         # Test font stretch compression
-        success = await fit_loop._compress_text(css_props, 2)
+        success = fit_loop._compress_text(css_props, 2)
         assert success is True
         assert css_props["font-stretch"] == "condensed"
     
-    @pytest.mark.asyncio
-    async def test_css_expansion_steps(self, fit_loop):
+    def test_css_expansion_steps(self, fit_loop):
         """Test CSS expansion for sparse text."""
         
-        css_props = {
-            "line-height": "1.5",
-            "letter-spacing": "0em"
-        }
+        css_props = CssState(line_height=1.5, letter_spacing=0.0)
         
         # Test line height expansion
-        result_props = await fit_loop._expand_text(css_props, 0)
+        result_props = fit_loop._expand_text(css_props, 0)
         assert float(result_props["line-height"]) > 1.5
         
         # Test letter spacing expansion
-        result_props = await fit_loop._expand_text(css_props, 1)
+        result_props = fit_loop._expand_text(css_props, 1)
         assert float(result_props["letter-spacing"].rstrip("em")) > 0
     
     def test_mock_measure_func(self):
@@ -0,0 +1,42 @@
+import pytest
+from starlette.requests import Request
+
+from app.backend.routes import make_etag, not_modified
+
+
+def make_request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode("latin-1"))] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+class TestConditionalRequests:
+    """Test cases for If-None-Match handling on cached reads."""
+    
+    @pytest.fixture
+    def etag(self):
+        return make_etag(1, "2024-01-01")
+    
+    def test_missing_header(self, etag):
+        """Test that a request without If-None-Match gets the full response."""
+        
+        assert not_modified(make_request(), etag) is None
+    
+    @pytest.mark.parametrize("header", [
+        "{etag}",
+        'W/{etag}',
+        '"stale", {etag}',
+        '"stale",W/{etag} ',
+        "*",
+    ])
+    def test_matching_header(self, etag, header):
+        """Test exact, weak, listed and wildcard tags all return 304."""
+        
+        response = not_modified(make_request(header.format(etag=etag)), etag)
+        assert response is not None
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+    
+    def test_stale_header(self, etag):
+        """Test that only other tags yield the full response."""
+        
+        assert not_modified(make_request('"stale", W/"older"'), etag) is None
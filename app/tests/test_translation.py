@@ -1,17 +1,16 @@
 import pytest
 import asyncio
-import sys
-from pathlib import Path
 from unittest.mock import AsyncMock, patch
 
-sys.path.append(str(Path(__file__).parent.parent.parent))
-
 from app.backend.services.translation import (
     MockTranslationProvider, 
     translate_paragraph,
-    get_translation_provider
+    translate_paragraphs,
+    get_translation_provider,
+    _restore_placeholders
 )
 from app.shared.schemas import GlossaryTerm
+from app.shared.utils.chinese_typography import sanitize_inline_markup
 
 
 class TestTranslation:
@@ -114,7 +113,37 @@ class TestTranslation:
             glossary=case_sensitive_terms
         )
         assert "复兴" in result2
-    
+
+    @pytest.mark.asyncio
+    async def test_case_insensitive_glossary(self, mock_provider):
+        """Test case-insensitive glossary matching, including long s OCR output."""
+
+        terms = [
+            GlossaryTerm(
+                id=1, glossary_id=1,
+                src="Buchdruck", tgt="印刷术",
+                case_sensitive=False, notes=None
+            )
+        ]
+
+        for text in ["Der BUCHDRUCK", "Der buchdruck", "Der Buchdruck"]:
+            result = await mock_provider.translate_text(
+                text=text,
+                source_lang="de",
+                target_lang="zh-CN",
+                glossary=terms
+            )
+            assert "印刷术" in result
+        
+        # 'ſ' folds to 's' when matching but doesn't lowercase to it
+        result = await mock_provider.translate_text(
+            text="Die Renaiſſance",
+            source_lang="de",
+            target_lang="zh-CN",
+            glossary=terms
+        )
+        assert "文艺复兴" in result
+
     @pytest.mark.asyncio
     async def test_concise_translation(self, mock_provider):
         """Test concise translation mode."""
@@ -159,6 +188,55 @@ class TestTranslation:
         # Should translate the text around markup
         assert result != text_with_markup
     
+    @pytest.mark.asyncio
+    async def test_translated_markup_survives_export(self):
+        """Test that preserved inline tags reach the exports while stray markup is escaped."""
+        
+        result = await translate_paragraph(
+            text="Die moderne <i>Typografie</i> ist wichtig",
+            source_lang="de",
+            target_lang="zh-CN"
+        )
+        html = sanitize_inline_markup(result + " a < b & <script>")
+        
+        assert "<i>" in html and "</i>" in html
+        assert "&lt; b &amp; &lt;script&gt;" in html
+    
+    @pytest.mark.asyncio
+    async def test_translate_paragraph_fallback_keeps_keys_whole(self):
+        """Test the mock's truncated fallback never leaves half a placeholder key."""
+        
+        # The fallback excerpt ends inside the key for {FN:1}
+        result = await translate_paragraph(
+            text="abcdefghijklmnopq {FN:1} xyz",
+            source_lang="de",
+            target_lang="zh-CN"
+        )
+        
+        assert "⟦" not in result and "⟧" not in result
+        assert "\x00" not in result
+
+    @pytest.mark.asyncio
+    async def test_translate_paragraph_placeholder_keys_are_not_translation(self):
+        """Test that placeholder keys alone don't count as translated text."""
+
+        result = await translate_paragraph(
+            text="qqq <i>x</i> zzz {FN:1} www",
+            source_lang="de",
+            target_lang="zh-CN"
+        )
+
+        assert result.startswith("这是一段从德语翻译过来的文本：")
+
+    def test_restore_placeholders_rejects_mangled_keys(self):
+        """Test that partial or unknown keys are rejected instead of stored."""
+        
+        assert _restore_placeholders("译文⟦0⟧", ["<i>x</i>"]) == "译文<i>x</i>"
+        
+        for mangled in ["译文⟦0", "译文0⟧", "译文⟦1⟧"]:
+            with pytest.raises(ValueError):
+                _restore_placeholders(mangled, ["<i>x</i>"])
+    
     @pytest.mark.asyncio
     async def test_translate_paragraph_empty_text(self):
         """Test translation of empty or whitespace-only text."""
@@ -196,6 +274,23 @@ class TestTranslation:
         markup_part = result[result.find("<b>"):result.find("</b>") + 4]
         assert "{REF:2}" in markup_part
     
+    @pytest.mark.asyncio
+    async def test_translate_paragraphs_batch(self):
+        """Test batch translation matches per-paragraph translation."""
+        
+        texts = [
+            "Die {FN:1} moderne <i>Typografie</i> ist wichtig",
+            "   ",
+            "Die Geschichte der Typografie"
+        ]
+        
+        results = await translate_paragraphs(texts, "de", "zh-CN")
+        
+        assert len(results) == len(texts)
+        assert results[1] == texts[1]
+        for text, result in zip(texts, results):
+            assert result == await translate_paragraph(text, "de", "zh-CN")
+    
     @pytest.mark.asyncio 
     async def test_translation_provider_factory(self):
         """Test translation provider factory."""
@@ -238,13 +333,17 @@ class TestTranslation:
             "mit der Zeit"
         ]
         
-        for phrase in german_phrases:
-            result = await mock_provider.translate_text(
+        # The mock simulates provider latency, so translate all at once
+        results = await asyncio.gather(*(
+            mock_provider.translate_text(
                 text=phrase,
                 source_lang="de",
                 target_lang="zh-CN"
             )
-            
+            for phrase in german_phrases
+        ))
+        
+        for phrase, result in zip(german_phrases, results):
             # Should produce some translation
             assert result != phrase
             assert len(result) > 0
@@ -253,7 +352,26 @@ class TestTranslation:
             if len(phrase) > 5:
                 chinese_chars = [c for c in result if ord(c) > 127]
                 assert len(chinese_chars) > 0
-    
+
+    @pytest.mark.asyncio
+    async def test_long_s_word_substitution(self, mock_provider):
+        """Test that the long s of Fraktur OCR output matches case-insensitive words."""
+
+        # 'ſ' folds to 's' under IGNORECASE but not under str.lower()
+        result = await mock_provider.translate_text(
+            text="Die Zeitung iſt alt",
+            source_lang="de",
+            target_lang="zh-CN"
+        )
+        assert "是" in result
+
+        result = await mock_provider.translate_text(
+            text="ſom hej",
+            source_lang="sv",
+            target_lang="zh-CN"
+        )
+        assert result
+
     @pytest.mark.asyncio
     async def test_error_handling(self, mock_provider):
         """Test error handling in translation."""
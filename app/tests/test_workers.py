@@ -0,0 +1,83 @@
+import pytest
+import fakeredis
+from rq import Queue, SimpleWorker
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.workers.main as worker_main
+from app.backend.models import Base, Book, Page, Block, Job
+
+
+class TestTranslationShards:
+    """Test cases for translation jobs split into shard jobs."""
+
+    @pytest.fixture
+    def redis_conn(self, monkeypatch):
+        conn = fakeredis.FakeRedis()
+        monkeypatch.setattr(worker_main, "redis_conn", conn)
+        monkeypatch.setattr(worker_main, "translation_queue", Queue("translation", connection=conn))
+        return conn
+
+    @pytest.fixture
+    def session_factory(self, monkeypatch):
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        factory = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+        monkeypatch.setattr(worker_main, "SessionLocal", factory)
+        return factory
+
+    @pytest.fixture
+    def book_job(self, session_factory):
+        """A book with two untranslated blocks and a pending translation job."""
+        with session_factory() as db:
+            book = Book(title="Test", source_lang="de", target_lang="zh-CN")
+            db.add(book)
+            db.flush()
+            page = Page(book_id=book.id, index=0, image_url="", width=100, height=100)
+            db.add(page)
+            db.flush()
+            db.add_all([
+                Block(
+                    page_id=page.id, type="paragraph", order=i, text_source=f"Text {i}",
+                    bbox_x=0, bbox_y=0, bbox_w=10, bbox_h=10
+                )
+                for i in range(2)
+            ])
+            job = Job(book_id=book.id, type="translate", status="pending")
+            db.add(job)
+            db.commit()
+            return book.id, job.id
+
+    def test_failing_shard_fails_job(self, monkeypatch, redis_conn, session_factory, book_job):
+        """Test that one failed shard marks the parent job failed."""
+
+        book_id, job_id = book_job
+        monkeypatch.setattr(worker_main, "TRANSLATION_SHARD_SIZE", 1)
+
+        calls = []
+
+        async def translate_blocks(db, book, blocks, request):
+            calls.append(blocks)
+            if len(calls) == 1:
+                raise RuntimeError("provider down")
+            return len(blocks), 0
+
+        monkeypatch.setattr(worker_main, "translate_blocks", translate_blocks)
+
+        result = worker_main.run_job(worker_main.process_translation_job(book_id, job_id, {}))
+        assert result == {"status": "in_progress", "shards": 2}
+
+        queue = worker_main.translation_queue
+        SimpleWorker([queue], connection=redis_conn).work(burst=True)
+
+        assert len(calls) == 2
+        with session_factory() as db:
+            job = db.get(Job, job_id)
+            assert job.status == "failed"
+            assert "provider down" in job.logs
+
+        # The running status is gone once the job has failed
+        assert not redis_conn.exists(worker_main.job_status_key(job_id))
@@ -1,127 +1,270 @@
-import os
 import asyncio
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any
-from redis import Redis
-from rq import Worker, Queue, Connection
-from pathlib import Path
-import sys
-
-# Add app to Python path
-sys.path.append(str(Path(__file__).parent.parent))
-
-from app.backend.models import Book, Page, Block, Job
-from app.backend.database import SessionLocal
-from app.backend.services.translation import translate_paragraph, get_translation_provider
-from app.backend.services.typesetting import TypesettingEngine
+from typing import List, Dict, Any, Coroutine, Sequence, Tuple, TypeVar
+import orjson
+from redis.exceptions import RedisError
+from rq import Worker
+from sqlalchemy import delete, insert, select, update
+
+from app.backend.models import Book, Page, Block, Job, GlossaryTerm as GlossaryTermModel
+from app.backend.database import get_session_factory
+from app.backend.services.translation import needs_translation, translate_paragraphs, get_translation_provider
+from app.backend.services.cache import CONTENT_CACHE_TTL, content_key, get_or_set_many
+from app.backend.services.typesetting import get_typesetting_engine, preload_pdf_renderer
 from app.backend.services.export import ExportService
 from app.backend.ocr_providers.mock import MockOCRProvider
-from app.shared.schemas import GlossaryTerm, TranslationRequest, ExportRequest
+from app.shared.schemas import GlossaryTerm, OCRResult, TranslationRequest, ExportRequest
+from app.workers.queues import JOB_FAILURE_CALLBACK, get_queue, get_redis_conn, job_status_key
+from app.shared.constants import (
+    BOOKS_DIR, GLOSSARY_CACHE_TTL, JOB_STATUS_TTL, JOB_TIMEOUT, SHARD_PROGRESS_TTL,
+    TRANSLATION_BATCH_SIZE, TRANSLATION_SHARD_SIZE
+)
+
+try:
+    import uvloop  # Installed with uvicorn[standard]; cheaper task scheduling
+    new_event_loop = uvloop.new_event_loop
+except ImportError:  # Optional in development; the stock loop works the same
+    new_event_loop = asyncio.new_event_loop
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Redis connection
-redis_conn = Redis(
-    host=os.getenv('REDIS_HOST', 'localhost'),
-    port=int(os.getenv('REDIS_PORT', '6379')),
-    db=int(os.getenv('REDIS_DB', '0'))
-)
+T = TypeVar("T")
+
+# The worker always needs its database and queues, so bind them once at import
+SessionLocal = get_session_factory()
+redis_conn = get_redis_conn()
+ocr_queue = get_queue('ocr')
+translation_queue = get_queue('translation')
+typeset_queue = get_queue('typeset')
+export_queue = get_queue('export')
+
+# Shared across jobs so provider setup (models, HTTP sessions) happens once per worker
+ocr_provider = MockOCRProvider()
+
+
+def mark_job_started(job_id: int) -> None:
+    """
+    Record a job as running in Redis.
+    
+    The transient in_progress state is kept out of SQL; the Job row is
+    written once, with the terminal status, and clear_job_status then
+    drops the Redis entry. The job status endpoint reads both.
+    """
+    key = job_status_key(job_id)
+    with redis_conn.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping={"status": "in_progress", "started": time.time()})
+        pipe.expire(key, JOB_STATUS_TTL)
+        pipe.execute()
+
+
+def clear_job_status(job_id: int) -> None:
+    """Drop a finished job's transient Redis status."""
+    redis_conn.delete(job_status_key(job_id))
+
+
+def fail_job(job_id: int, reason: str) -> None:
+    """
+    Mark a job failed unless it already finished.
+    
+    Used when the job's own error handling never ran: an RQ callback or a
+    killed work horse. A shard failure fails its parent job.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job and job.status not in ("completed", "failed"):
+            job.status = "failed"
+            job.logs = reason
+            db.commit()
+    finally:
+        db.close()
+    clear_job_status(job_id)
+    logger.error(f"Job {job_id} marked failed: {reason}")
+
+
+def on_job_failure(rq_job, connection, exc_type, exc_value, traceback) -> None:
+    """RQ failure callback; every job function takes (book_id, job_id, ...)."""
+    fail_job(rq_job.args[1], f"{exc_type.__name__}: {exc_value}")
+
+
+def on_work_horse_killed(rq_job, retpid, ret_val, rusage) -> None:
+    """Fail the job of a work horse that died without running its callbacks."""
+    fail_job(rq_job.args[1], f"Worker process exited unexpectedly (status {ret_val})")
+
+
+def create_worker() -> Worker:
+    """Build the RQ worker for all queues, failing jobs whose work horse dies."""
+    return Worker(
+        [ocr_queue, translation_queue, typeset_queue, export_queue],
+        connection=redis_conn,
+        work_horse_killed_handler=on_work_horse_killed
+    )
+
+
+def glossary_signature(terms: Sequence[GlossaryTerm]) -> str:
+    """Hash the parts of a glossary that affect translations, for cache keys."""
+    return hashlib.sha256(repr(sorted(
+        (term.src, term.tgt, term.case_sensitive) for term in terms
+    )).encode('utf-8')).hexdigest()
 
-# Queues
-ocr_queue = Queue('ocr', connection=redis_conn)
-translation_queue = Queue('translation', connection=redis_conn)
-typeset_queue = Queue('typeset', connection=redis_conn)
-export_queue = Queue('export', connection=redis_conn)
+
+def _glossary_cache_key(glossary_id: int) -> str:
+    return f"glossary:{glossary_id}:terms"
+
+
+def get_glossary_terms(db, glossary_id: int) -> Tuple[Tuple[GlossaryTerm, ...], str]:
+    """
+    Fetch a glossary's terms and signature, reusing a recent read for the
+    same glossary.
+    
+    Glossaries change rarely but books of the same series (and the shards of
+    one book) are translated back to back. The read is cached in Redis, not
+    in the process: RQ forks a work horse per job, so process memory never
+    outlives the job that filled it. Terms are returned as a tuple so one
+    read is safely shared by concurrent tasks.
+    """
+    key = _glossary_cache_key(glossary_id)
+    try:
+        cached = redis_conn.get(key)
+    except RedisError as e:
+        logger.warning(f"Glossary cache read failed for {key}: {e}")
+        cached = None
+    
+    if cached is not None:
+        terms = tuple(GlossaryTerm(**term) for term in orjson.loads(cached))
+    else:
+        rows = db.scalars(select(GlossaryTermModel).where(GlossaryTermModel.glossary_id == glossary_id))
+        terms = tuple(GlossaryTerm.from_orm(row) for row in rows)
+        try:
+            redis_conn.set(key, orjson.dumps([term.dict() for term in terms]), ex=GLOSSARY_CACHE_TTL)
+        except RedisError as e:
+            logger.warning(f"Glossary cache write failed for {key}: {e}")
+    
+    return terms, glossary_signature(terms)
+
+
+def load_book_layout(db, book_id: int):
+    """
+    Load a book's pages and blocks as plain column rows.
+    
+    Typesetting and export only read these, so skip ORM object construction
+    and identity-map bookkeeping; rows still allow attribute access.
+    """
+    pages = db.execute(
+        select(*Page.__table__.c).where(Page.book_id == book_id).order_by(Page.index)
+    ).all()
+    blocks = db.execute(
+        select(*Block.__table__.c).join(Page).where(
+            Page.book_id == book_id
+        ).order_by(Page.index, Block.order)
+    ).all()
+    return pages, blocks
+
+
+def save_ocr_page(db, book_id: int, ocr_result: OCRResult, page_ids: Dict[int, int]) -> None:
+    """
+    Create or reuse the page for an OCR result and replace its blocks.
+    
+    page_ids maps the book's existing page indices to page ids and is
+    updated with any page created here. Blocking; the OCR job calls it in
+    a worker thread, one page at a time.
+    """
+    page_id = page_ids.get(ocr_result.page.index)
+    
+    if page_id is None:
+        page = Page(
+            book_id=book_id,
+            index=ocr_result.page.index,
+            image_url=f"/static/books/{book_id}/page_{ocr_result.page.index}.png",
+            width=ocr_result.page.width,
+            height=ocr_result.page.height,
+            dpi=ocr_result.page.dpi
+        )
+        db.add(page)
+        db.flush()  # assigns page.id; committed with the blocks below
+        page_id = page_ids[page.index] = page.id
+    
+    # Replace the page's blocks with one DELETE and one multi-row
+    # INSERT; no Block objects are loaded or tracked by the session
+    db.execute(
+        delete(Block).where(Block.page_id == page_id),
+        execution_options={"synchronize_session": False}
+    )
+    if ocr_result.blocks:
+        db.execute(insert(Block), [
+            {
+                "page_id": page_id,
+                "type": ocr_block.type.value,
+                "bbox_x": ocr_block.bbox.x,
+                "bbox_y": ocr_block.bbox.y,
+                "bbox_w": ocr_block.bbox.w,
+                "bbox_h": ocr_block.bbox.h,
+                "order": ocr_block.order,
+                "text_source": " ".join(line.text for line in ocr_block.lines),
+                "status": "pending"
+            }
+            for ocr_block in ocr_result.blocks
+        ])
+    
+    db.commit()
 
 
 async def process_ocr_job(book_id: int, job_id: int) -> Dict[str, Any]:
     """Process OCR job for a book."""
     db = SessionLocal()
+    job = None
     
     try:
-        # Update job status
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = db.get(Job, job_id)
         if not job:
             raise Exception(f"Job {job_id} not found")
         
-        job.status = "in_progress"
-        db.commit()
+        mark_job_started(job_id)
         
         # Get book
-        book = db.query(Book).filter(Book.id == book_id).first()
+        book = db.get(Book, book_id)
         if not book:
             raise Exception(f"Book {book_id} not found")
         
-        # Initialize OCR provider
-        ocr_provider = MockOCRProvider()
-        
-        # Process book source file
-        book_dir = Path(f"data/books/{book_id}")
-        source_files = list(book_dir.glob("source.*"))
+        # Process book source file; upload_book records its extension
+        source_file = BOOKS_DIR / str(book_id) / f"source{book.source_ext}"
         
-        if not source_files:
+        if not book.source_ext or not source_file.exists():
             raise Exception("No source file found")
         
-        source_file = source_files[0]
+        async def ocr_pages():
+            if source_file.suffix.lower() == '.pdf':
+                async for result in ocr_provider.process_pdf(source_file):
+                    yield result
+            else:
+                yield await ocr_provider.process_image_cached(source_file)
         
-        if source_file.suffix.lower() == '.pdf':
-            ocr_results = await ocr_provider.process_pdf(source_file)
-        else:
-            ocr_results = [await ocr_provider.process_image(source_file)]
+        # Look up the book's existing pages once rather than per result
+        page_ids = dict(db.execute(
+            select(Page.index, Page.id).where(Page.book_id == book_id)
+        ).all())
         
-        # Create pages and blocks
-        for ocr_result in ocr_results:
-            # Check if page already exists
-            existing_page = db.query(Page).filter(
-                Page.book_id == book_id,
-                Page.index == ocr_result.page.index
-            ).first()
-            
-            if not existing_page:
-                page = Page(
-                    book_id=book_id,
-                    index=ocr_result.page.index,
-                    image_url=f"/static/books/{book_id}/page_{ocr_result.page.index}.png",
-                    width=ocr_result.page.width,
-                    height=ocr_result.page.height,
-                    dpi=ocr_result.page.dpi
-                )
-                db.add(page)
-                db.commit()
-                db.refresh(page)
-            else:
-                page = existing_page
-            
-            # Remove existing blocks for this page
-            db.query(Block).filter(Block.page_id == page.id).delete()
-            
-            # Create new blocks
-            for ocr_block in ocr_result.blocks:
-                block = Block(
-                    page_id=page.id,
-                    type=ocr_block.type.value,
-                    bbox_x=ocr_block.bbox.x,
-                    bbox_y=ocr_block.bbox.y,
-                    bbox_w=ocr_block.bbox.w,
-                    bbox_h=ocr_block.bbox.h,
-                    order=ocr_block.order,
-                    text_source=" ".join(line.text for line in ocr_block.lines),
-                    status="pending"
-                )
-                db.add(block)
-            
-            db.commit()
+        # Create pages and blocks as each page's OCR result arrives
+        pages_processed = 0
+        async for ocr_result in ocr_pages():
+            pages_processed += 1
+            # Persisting runs in a thread so the pages still being OCR'd
+            # keep making progress on the event loop meanwhile
+            await asyncio.to_thread(save_ocr_page, db, book_id, ocr_result, page_ids)
         
         # Update job status
         job.status = "completed"
         db.commit()
         
         logger.info(f"OCR job {job_id} completed for book {book_id}")
-        return {"status": "completed", "pages_processed": len(ocr_results)}
+        return {"status": "completed", "pages_processed": pages_processed}
         
     except Exception as e:
-        # Update job with error
+        # Discard any half-applied work; the loaded job row is reused as-is
+        db.rollback()
         if job:
             job.status = "failed"
             job.logs = str(e)
@@ -132,64 +275,151 @@ async def process_ocr_job(book_id: int, job_id: int) -> Dict[str, Any]:
     
     finally:
         db.close()
+        clear_job_status(job_id)
+
+
+async def translate_blocks(db, book, blocks, request: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    Translate (id, text_source) block rows and write the results back.
+    
+    Returns the (translated, failed) counts.
+    """
+    # Get glossary terms if specified
+    if request.get('glossary_id'):
+        glossary_terms, glossary_sig = get_glossary_terms(db, request['glossary_id'])
+    else:
+        glossary_terms, glossary_sig = (), glossary_signature(())
+    
+    length_policy = request.get('length_hint', 'normal')
+    # Cached translations are only reused for the provider and model that made them
+    provider_tag = get_translation_provider().cache_tag
+    
+    translated_count = 0
+    failed_count = 0
+    
+    # Markup-only and blank blocks (separators, footnote markers) keep their
+    # source text; they skip the cache and provider entirely
+    passthrough = []
+    to_translate = []
+    for block in blocks:
+        if needs_translation(block.text_source):
+            to_translate.append(block)
+        else:
+            passthrough.append({"id": block.id, "text_translated": block.text_source, "status": "translated"})
+    if passthrough:
+        db.execute(update(Block), passthrough)
+        db.commit()
+        translated_count += len(passthrough)
+    blocks = to_translate
+    
+    # Translate in batches, committing each so a long book keeps its
+    # progress (and a re-run resumes) if the worker stops mid-job
+    for start in range(0, len(blocks), TRANSLATION_BATCH_SIZE):
+        batch = blocks[start:start + TRANSLATION_BATCH_SIZE]
+        
+        # Identical paragraphs (repeated headers, re-runs) hit the cache;
+        # the misses go to the provider as one concurrent batch. Keys
+        # ignore whitespace layout, so OCR variants of a paragraph that
+        # differ only in spacing or line joins share one translation
+        keys = [
+            content_key(
+                "tr", " ".join(block.text_source.split()), book.source_lang,
+                book.target_lang, length_policy, glossary_sig, provider_tag
+            )
+            for block in batch
+        ]
+        
+        async def load(misses: List[int]) -> List[Any]:
+            return await translate_paragraphs(
+                [batch[i].text_source for i in misses],
+                source_lang=book.source_lang,
+                target_lang=book.target_lang,
+                glossary=glossary_terms,
+                length_policy=length_policy,
+                return_exceptions=True
+            )
+        
+        results = await get_or_set_many(keys, CONTENT_CACHE_TTL, load)
+        
+        translated = []
+        failed = []
+        for block, result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error translating block {block.id}: {result}")
+                failed.append({"id": block.id, "status": "failed"})
+            else:
+                translated.append({"id": block.id, "text_translated": result, "status": "translated"})
+        
+        if translated:
+            db.execute(update(Block), translated)
+        if failed:
+            db.execute(update(Block), failed)
+        db.commit()
+        translated_count += len(translated)
+        failed_count += len(failed)
+    
+    return translated_count, failed_count
+
+
+def _shard_progress_key(job_id: int) -> str:
+    return f"translation:{job_id}:shards"
 
 
 async def process_translation_job(book_id: int, job_id: int, request: Dict[str, Any]) -> Dict[str, Any]:
     """Process translation job for a book."""
     db = SessionLocal()
+    job = None
+    sharded = False
     
     try:
-        # Update job status
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = db.get(Job, job_id)
         if not job:
             raise Exception(f"Job {job_id} not found")
         
-        job.status = "in_progress"
-        db.commit()
+        mark_job_started(job_id)
         
         # Get book and blocks
-        book = db.query(Book).filter(Book.id == book_id).first()
+        book = db.get(Book, book_id)
         if not book:
             raise Exception(f"Book {book_id} not found")
         
-        blocks = db.query(Block).join(Page).filter(
-            Page.book_id == book_id,
-            Block.text_translated.is_(None)
-        ).order_by(Page.index, Block.order).all()
+        # Only ids and source text are needed; results are written back with
+        # bulk UPDATEs by primary key rather than through tracked ORM objects
+        blocks = db.execute(
+            select(Block.id, Block.text_source).join(Page).where(
+                Page.book_id == book_id,
+                Block.text_translated.is_(None)
+            ).order_by(Page.index, Block.order)
+        ).all()
         
         if not blocks:
             raise Exception("No blocks to translate")
         
-        # Get glossary terms if specified
-        glossary_terms = []
-        if request.get('glossary_id'):
-            # This would fetch glossary terms from DB
-            pass
-        
-        # Translate each block
-        translated_count = 0
-        failed_count = 0
-        
-        for block in blocks:
-            try:
-                translated = await translate_paragraph(
-                    text=block.text_source,
-                    source_lang=book.source_lang,
-                    target_lang=book.target_lang,
-                    glossary=glossary_terms,
-                    length_policy=request.get('length_hint', 'normal')
+        # Large books fan out to shard jobs so every idle translation worker
+        # can take a part; the last shard to finish completes this job
+        if len(blocks) > TRANSLATION_SHARD_SIZE:
+            shards = [
+                [block.id for block in blocks[start:start + TRANSLATION_SHARD_SIZE]]
+                for start in range(0, len(blocks), TRANSLATION_SHARD_SIZE)
+            ]
+            progress_key = _shard_progress_key(job_id)
+            with redis_conn.pipeline(transaction=True) as pipe:
+                pipe.hset(progress_key, mapping={"pending": len(shards), "translated": 0, "failed": 0})
+                pipe.expire(progress_key, SHARD_PROGRESS_TTL)
+                pipe.hset(job_status_key(job_id), "logs", f"Translating {len(blocks)} blocks in {len(shards)} shards")
+                pipe.execute()
+            sharded = True
+            for block_ids in shards:
+                translation_queue.enqueue(
+                    "app.workers.main.sync_process_translation_shard",
+                    book_id, job_id, block_ids, request, job_timeout=JOB_TIMEOUT,
+                    on_failure=JOB_FAILURE_CALLBACK  # one failed shard fails the job
                 )
-                
-                block.text_translated = translated
-                block.status = "translated"
-                translated_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error translating block {block.id}: {e}")
-                block.status = "failed"
-                failed_count += 1
             
-            db.commit()
+            logger.info(f"Translation job {job_id} split into {len(shards)} shards")
+            return {"status": "in_progress", "shards": len(shards)}
+        
+        translated_count, failed_count = await translate_blocks(db, book, blocks, request)
         
         # Update job status
         job.status = "completed" if failed_count == 0 else "completed"  # Still mark as completed even with some failures
@@ -204,6 +434,8 @@ async def process_translation_job(book_id: int, job_id: int, request: Dict[str,
         }
         
     except Exception as e:
+        # Discard any half-applied work; the loaded job row is reused as-is
+        db.rollback()
         if job:
             job.status = "failed"
             job.logs = str(e)
@@ -214,44 +446,109 @@ async def process_translation_job(book_id: int, job_id: int, request: Dict[str,
     
     finally:
         db.close()
+        # A split job stays running until its last shard completes it
+        if not sharded:
+            clear_job_status(job_id)
+
+
+async def process_translation_shard(
+    book_id: int,
+    job_id: int,
+    block_ids: List[int],
+    request: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Translate one shard of a book; the last shard to finish completes the job."""
+    db = SessionLocal()
+    translated_count = failed_count = 0
+    error = None
+    
+    try:
+        book = db.get(Book, book_id)
+        if not book:
+            raise Exception(f"Book {book_id} not found")
+        
+        # Blocks translated since the split (e.g. a retried shard) are skipped
+        blocks = db.execute(
+            select(Block.id, Block.text_source).where(
+                Block.id.in_(block_ids),
+                Block.text_translated.is_(None)
+            )
+        ).all()
+        
+        translated_count, failed_count = await translate_blocks(db, book, blocks, request)
+        
+    except Exception as e:
+        db.rollback()
+        error = str(e)
+        logger.error(f"Translation shard of job {job_id} failed: {e}")
+    
+    try:
+        # Record this shard's outcome atomically; exactly one shard sees the
+        # pending count reach zero
+        pipe = redis_conn.pipeline()
+        progress_key = _shard_progress_key(job_id)
+        pipe.hincrby(progress_key, "translated", translated_count)
+        pipe.hincrby(progress_key, "failed", failed_count)
+        if error:
+            pipe.hsetnx(progress_key, "error", error)
+        pipe.hincrby(progress_key, "pending", -1)
+        pipe.hgetall(progress_key)
+        progress = {key.decode(): value.decode() for key, value in pipe.execute()[-1].items()}
+        
+        if int(progress["pending"]) == 0:
+            job = db.get(Job, job_id)
+            if job:
+                if "error" in progress:
+                    job.status = "failed"
+                    job.logs = progress["error"]
+                else:
+                    job.status = "completed"
+                    job.logs = f"Translated {progress['translated']} blocks, {progress['failed']} failed"
+                db.commit()
+            redis_conn.delete(progress_key, job_status_key(job_id))
+            logger.info(f"Translation job {job_id} completed: {progress['translated']} translated, {progress['failed']} failed")
+    
+    finally:
+        db.close()
+    
+    if error:
+        raise Exception(error)
+    return {"status": "completed", "translated_count": translated_count, "failed_count": failed_count}
 
 
 async def process_typeset_job(book_id: int, job_id: int) -> Dict[str, Any]:
     """Process typesetting job for a book."""
     db = SessionLocal()
+    job = None
     
     try:
-        # Update job status
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = db.get(Job, job_id)
         if not job:
             raise Exception(f"Job {job_id} not found")
         
-        job.status = "in_progress"
-        db.commit()
+        mark_job_started(job_id)
         
         # Get book, pages, and blocks
-        book = db.query(Book).filter(Book.id == book_id).first()
+        book = db.get(Book, book_id)
         if not book:
             raise Exception(f"Book {book_id} not found")
         
-        pages = db.query(Page).filter(Page.book_id == book_id).order_by(Page.index).all()
-        blocks = db.query(Block).join(Page).filter(Page.book_id == book_id).all()
+        pages, blocks = load_book_layout(db, book_id)
         
         if not pages or not blocks:
             raise Exception("No pages or blocks found")
         
-        # Initialize typesetting engine
-        typesetting_engine = TypesettingEngine()
-        
         # Typeset all pages
-        typeset_pages = await typesetting_engine.typeset_pages(pages, blocks)
-        
-        # Update block statuses
-        for block in blocks:
-            if block.text_translated:
-                block.status = "typeset"
-        
-        db.commit()
+        typeset_pages = await get_typesetting_engine().typeset_pages(pages, blocks)
+        
+        # Update block statuses in one statement, committed with the job status
+        db.execute(
+            update(Block).where(
+                Block.page_id.in_(select(Page.id).where(Page.book_id == book_id)),
+                Block.text_translated.isnot(None),
+                Block.text_translated != ""
+            ).values(status="typeset")
+        )
         
         # Update job status
         job.status = "completed"
@@ -262,6 +559,8 @@ async def process_typeset_job(book_id: int, job_id: int) -> Dict[str, Any]:
         return {"status": "completed", "pages_typeset": len(typeset_pages)}
         
     except Exception as e:
+        # Discard any half-applied work; the loaded job row is reused as-is
+        db.rollback()
         if job:
             job.status = "failed"
             job.logs = str(e)
@@ -272,28 +571,27 @@ async def process_typeset_job(book_id: int, job_id: int) -> Dict[str, Any]:
     
     finally:
         db.close()
+        clear_job_status(job_id)
 
 
 async def process_export_job(book_id: int, job_id: int, request: Dict[str, Any]) -> Dict[str, Any]:
     """Process export job for a book."""
     db = SessionLocal()
+    job = None
     
     try:
-        # Update job status
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = db.get(Job, job_id)
         if not job:
             raise Exception(f"Job {job_id} not found")
         
-        job.status = "in_progress"
-        db.commit()
+        mark_job_started(job_id)
         
         # Get book, pages, and blocks
-        book = db.query(Book).filter(Book.id == book_id).first()
+        book = db.get(Book, book_id)
         if not book:
             raise Exception(f"Book {book_id} not found")
         
-        pages = db.query(Page).filter(Page.book_id == book_id).order_by(Page.index).all()
-        blocks = db.query(Block).join(Page).filter(Page.book_id == book_id).all()
+        pages, blocks = load_book_layout(db, book_id)
         
         if not pages or not blocks:
             raise Exception("No pages or blocks found")
@@ -321,6 +619,8 @@ async def process_export_job(book_id: int, job_id: int, request: Dict[str, Any])
         return {"status": "completed", "export_url": export_url}
         
     except Exception as e:
+        # Discard any half-applied work; the loaded job row is reused as-is
+        db.rollback()
         if job:
             job.status = "failed"
             job.logs = str(e)
@@ -331,26 +631,44 @@ async def process_export_job(book_id: int, job_id: int, request: Dict[str, Any])
     
     finally:
         db.close()
+        clear_job_status(job_id)
+
+
+def run_job(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a job coroutine to completion on a fresh event loop.
+    
+    RQ's Worker forks a work horse per job, so there is no loop to reuse
+    across jobs. Like asyncio.run, the runner cancels leftover tasks and
+    shuts down async generators and the default executor (which the DB
+    writes use through asyncio.to_thread) before the loop is closed.
+    """
+    with asyncio.Runner(loop_factory=new_event_loop) as runner:
+        return runner.run(coro)
 
 
 # Synchronous wrapper functions for RQ (since RQ doesn't support async directly)
 def sync_process_ocr_job(book_id: int, job_id: int):
-    return asyncio.run(process_ocr_job(book_id, job_id))
+    return run_job(process_ocr_job(book_id, job_id))
 
 def sync_process_translation_job(book_id: int, job_id: int, request: Dict[str, Any]):
-    return asyncio.run(process_translation_job(book_id, job_id, request))
+    return run_job(process_translation_job(book_id, job_id, request))
+
+def sync_process_translation_shard(book_id: int, job_id: int, block_ids: List[int], request: Dict[str, Any]):
+    return run_job(process_translation_shard(book_id, job_id, block_ids, request))
 
 def sync_process_typeset_job(book_id: int, job_id: int):
-    return asyncio.run(process_typeset_job(book_id, job_id))
+    return run_job(process_typeset_job(book_id, job_id))
 
 def sync_process_export_job(book_id: int, job_id: int, request: Dict[str, Any]):
-    return asyncio.run(process_export_job(book_id, job_id, request))
+    return run_job(process_export_job(book_id, job_id, request))
 
 
 if __name__ == '__main__':
     logger.info("Starting GPTrans workers...")
     
+    # Job processes are forked from this one and inherit the warm renderer
+    preload_pdf_renderer()
+    
     # Listen to queues
-    with Connection(redis_conn):
-        worker = Worker([ocr_queue, translation_queue, typeset_queue, export_queue])
-        worker.work()
\ No newline at end of file
+    create_worker().work()
\ No newline at end of file
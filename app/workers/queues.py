@@ -0,0 +1,32 @@
+import os
+from functools import lru_cache
+from redis import Redis
+from rq import Queue
+from rq.job import Callback
+
+
+@lru_cache(maxsize=None)
+def get_redis_conn() -> Redis:
+    """Get the Redis connection the RQ queues use, creating it on first use."""
+    return Redis(
+        host=os.getenv('REDIS_HOST', 'localhost'),
+        port=int(os.getenv('REDIS_PORT', '6379')),
+        db=int(os.getenv('REDIS_DB', '0'))
+    )
+
+
+@lru_cache(maxsize=None)
+def get_queue(name: str) -> Queue:
+    """Get an RQ queue ('ocr', 'translation', 'typeset' or 'export') by name."""
+    return Queue(name, connection=get_redis_conn())
+
+
+# Marks the Job row failed when an RQ job raises or times out; referenced by
+# name so enqueuing doesn't import the worker code
+JOB_FAILURE_CALLBACK = Callback("app.workers.main.on_job_failure")
+
+
+def job_status_key(job_id: int) -> str:
+    """Redis hash holding a running job's transient status."""
+    return f"job:{job_id}"
+
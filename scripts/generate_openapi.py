@@ -3,28 +3,49 @@
 Generate OpenAPI schema for GPTrans API
 """
 
-import json
-import sys
 from pathlib import Path
 
-# Add project root to path
-sys.path.insert(0, str(Path(__file__).parent.parent))
+import fastapi
+import orjson
 
-from app.backend.main import app
+ROOT = Path(__file__).parent.parent
 
-def generate_openapi_schema():
-    """Generate and save OpenAPI schema."""
+# The schema is a pure function of the route and schema definitions
+SCHEMA_SOURCES = [
+    ROOT / "app" / "backend" / "routes.py",
+    ROOT / "app" / "shared" / "schemas.py",
+]
+
+
+def load_schema(output_path: Path) -> dict:
+    """Return the saved schema if it is newer than its sources, else regenerate it."""
+    if output_path.exists() and all(
+        path.stat().st_mtime <= output_path.stat().st_mtime for path in SCHEMA_SOURCES
+    ):
+        print(f"OpenAPI schema is up to date: {output_path}")
+        return orjson.loads(output_path.read_bytes())
     
+    # Only the routes are needed; app.backend.main would also create the
+    # data directories and static mount just to be imported. The database
+    # engines and Redis queues behind the routes are built on first use,
+    # so no database or Redis configuration is needed here
+    from app.backend.routes import API_INFO, router
+    app = fastapi.FastAPI(**API_INFO)
+    app.include_router(router)
     schema = app.openapi()
     
-    # Save to file
-    output_path = Path(__file__).parent.parent / "docs" / "openapi.json"
     output_path.parent.mkdir(exist_ok=True)
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(schema, f, indent=2, ensure_ascii=False)
+    output_path.write_bytes(orjson.dumps(schema, option=orjson.OPT_INDENT_2))
     
     print(f"OpenAPI schema saved to: {output_path}")
+    return schema
+
+
+def generate_openapi_schema():
+    """Generate and save OpenAPI schema."""
+    
+    output_path = ROOT / "docs" / "openapi.json"
+    schema = load_schema(output_path)
     
     # Print summary
     paths = schema.get('paths', {})
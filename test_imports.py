@@ -3,10 +3,6 @@
 Test script to verify all imports are working correctly
 """
 import sys
-from pathlib import Path
-
-# Add project root to Python path
-sys.path.insert(0, str(Path(__file__).parent))
 
 def test_imports():
     """Test all key module imports."""
@@ -21,7 +17,7 @@ def test_imports():
         print("✅ Shared modules imported successfully")
         
         # Test backend modules
-        from app.backend.database import get_db, engine
+        from app.backend.database import get_db, get_engine
         from app.backend.models import Book as BookModel, Block as BlockModel
         from app.backend.services.translation import MockTranslationProvider
         from app.backend.services.typesetting import TypesettingEngine
@@ -3,10 +3,6 @@
 Test script to verify the server can start
 """
 import sys
-from pathlib import Path
-
-# Add project root to Python path
-sys.path.insert(0, str(Path(__file__).parent))
 
 def test_server_startup():
     """Test that the FastAPI server can be instantiated."""